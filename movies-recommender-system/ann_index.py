@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import argparse
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import svds
+
+from neighbor_index import NeighborIndex, NEIGHBOR_INDEX_DIR, MISSING
+
+logger = logging.getLogger(__name__)
+
+# Approximate nearest-neighbor engine for catalogs too large for top-K lists
+# computed over all N^2 pairs. Tag vectors are reduced to DIMENSIONS dense
+# dimensions by truncated SVD and L2-normalized; an IVF index clusters them
+# into `nlist` lists and a query scans only the `nprobe` lists whose
+# centroids are closest. nprobe trades recall for latency at query time.
+#
+# On-disk layout (<dir>/):
+#   vectors.npy     float32, N x D, grouped by list (row order of list_rows)
+#   list_rows.npy   int32, N   catalog row of each vector
+#   list_offsets.npy int64, nlist + 1
+#   centroids.npy   float32, nlist x D
+#   components.npy  float32, D x V   projects new tag vectors
+#   meta.json       {"nprobe": default nprobe}
+
+ANN_INDEX_DIR = 'ann_index'
+DIMENSIONS = 256
+NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+KMEANS_ITERATIONS = 20
+SEED = 0
+
+_FILES = ('vectors', 'list_rows', 'list_offsets', 'centroids', 'components')
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def embed(matrix: sp.csr_matrix, dimensions: int = DIMENSIONS) -> Tuple[np.ndarray, np.ndarray]:
+    """Truncated SVD of the tag matrix: (N x D unit vectors, D x V components)."""
+    dimensions = min(dimensions, min(matrix.shape) - 1)
+    v0 = np.random.default_rng(SEED).standard_normal(min(matrix.shape))
+    u, s, vt = svds(matrix.astype(np.float64), k=dimensions, v0=v0)
+    order = np.argsort(-s)
+    vectors = u[:, order] * s[order]
+    return _normalize(vectors), vt[order].astype(np.float32)
+
+
+def spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS,
+                     seed: int = SEED) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster unit vectors by cosine similarity: (nlist x D centroids, cluster of each vector)."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    assignment = np.zeros(len(vectors), dtype=np.int64)
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=nlist)
+        empty = counts == 0
+        # Re-seed empty clusters with random vectors rather than letting them die
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+class AnnIndex:
+    """IVF index over SVD tag embeddings.
+
+    Answers the same calls as NeighborIndex (neighbors, neighbors_many,
+    blend), so recommender.py works with either engine.
+    """
+
+    def __init__(self, vectors: np.ndarray, list_rows: np.ndarray, list_offsets: np.ndarray,
+                 centroids: np.ndarray, components: np.ndarray, nprobe: int = NPROBE):
+        self.vectors = vectors
+        self.list_rows = list_rows
+        self.list_offsets = list_offsets
+        self.centroids = centroids
+        self.components = components
+        self.nprobe = nprobe
+        # Where each catalog row's vector sits in `vectors`
+        self.position = np.empty(len(list_rows), dtype=np.int64)
+        self.position[list_rows] = np.arange(len(list_rows))
+
+    def __len__(self) -> int:
+        return len(self.list_rows)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix: sp.csr_matrix, dimensions: int = DIMENSIONS, nlist: Optional[int] = None,
+              nprobe: int = NPROBE) -> "AnnIndex":
+        vectors, components = embed(matrix, dimensions)
+        if nlist is None:
+            nlist = max(1, int(round(np.sqrt(len(vectors)))))
+        centroids, assignment = spherical_kmeans(vectors, min(nlist, len(vectors)))
+        list_rows = np.argsort(assignment, kind='stable').astype(np.int32)
+        list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=len(centroids)), out=list_offsets[1:])
+        return cls(vectors[list_rows], list_rows, list_offsets, centroids, components, nprobe)
+
+    def vector(self, row: int) -> np.ndarray:
+        return np.asarray(self.vectors[self.position[row]])
+
+    def embed_tags(self, tag_vectors: sp.csr_matrix) -> np.ndarray:
+        """Unit embeddings for new L2-normalized tag vectors (same vocabulary)."""
+        return _normalize(np.asarray(tag_vectors @ self.components.T))
+
+    # --- Search ---
+    def search(self, query: np.ndarray, k: int = 5, nprobe: Optional[int] = None,
+               exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(catalog rows, cosine scores) of the k best matches in the nprobe closest lists."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+        spans = [np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in probe]
+        candidates = np.concatenate(spans) if spans else np.empty(0, dtype=np.int64)
+        rows = np.asarray(self.list_rows[candidates])
+        scores = np.asarray(self.vectors[candidates]) @ query
+        if exclude is not None and len(exclude):
+            keep = ~np.isin(rows, exclude)
+            rows, scores = rows[keep], scores[keep]
+        take = min(k, len(rows))
+        if take == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, take - 1)[:take]
+        top = top[np.lexsort((rows[top], -scores[top]))]  # best first, ties by row
+        return rows[top].astype(np.int32), scores[top].astype(np.float32)
+
+    def neighbors(self, row: int, k: int = 5, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        return self.search(self.vector(row), k, nprobe, exclude=np.array([row]))
+
+    def neighbors_many(self, rows, k: int = 5, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Same shape as NeighborIndex.neighbors_many: len(rows) x k, MISSING-padded."""
+        rows = np.asarray(rows, dtype=np.int64)
+        ids = np.full((len(rows), k), MISSING, dtype=np.int32)
+        scores = np.zeros((len(rows), k), dtype=np.float32)
+        for i, row in enumerate(rows):
+            row_ids, row_scores = self.neighbors(int(row), k, nprobe)
+            ids[i, :len(row_ids)] = row_ids
+            scores[i, :len(row_scores)] = row_scores
+        return ids, scores
+
+    def blend(self, rows, k: int = 5, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest movies to the seeds' mean embedding, seeds excluded."""
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        query = _normalize(np.asarray(self.vectors[self.position[rows]]).sum(axis=0, keepdims=True))[0]
+        return self.search(query, k, nprobe, exclude=rows)
+
+    # --- Persistence ---
+    def save(self, directory: str = ANN_INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+        for name in _FILES:
+            path = os.path.join(directory, f"{name}.npy")
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(getattr(self, name)))
+            os.replace(tmp_path, path)
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'nprobe': self.nprobe}, f)
+
+    @classmethod
+    def load(cls, directory: str = ANN_INDEX_DIR, mmap: bool = True, nprobe: Optional[int] = None) -> "AnnIndex":
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in _FILES}
+        if nprobe is None:
+            with open(os.path.join(directory, 'meta.json')) as f:
+                nprobe = int(os.getenv("ANN_NPROBE", json.load(f)['nprobe']))
+        return cls(nprobe=nprobe, **arrays)
+
+
+# --- Recall benchmark ---
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = [len(np.intersect1d(f[f != MISSING], t[t != MISSING])) / max(1, np.count_nonzero(t != MISSING))
+            for f, t in zip(found, truth)]
+    return float(np.mean(hits))
+
+
+def bench(index: AnnIndex, exact: Optional[NeighborIndex], k: int = 10, queries: int = 500,
+          nprobes=(1, 2, 4, 8, 16, 32)) -> list:
+    """Recall@k and per-query latency for each nprobe.
+
+    Recall is measured against exact search over the same embeddings (the
+    IVF approximation alone) and, if given, against the exact tag-space
+    neighbor index the app serves today (embedding + IVF together).
+    """
+    rng = np.random.default_rng(SEED)
+    sample = rng.choice(len(index), min(queries, len(index)), replace=False)
+
+    vectors = np.asarray(index.vectors)
+    truth = np.full((len(sample), k), MISSING, dtype=np.int32)
+    for i, row in enumerate(sample):
+        scores = vectors @ index.vector(row)
+        scores[index.position[row]] = -np.inf
+        top = np.argsort(-scores, kind='stable')[:k]
+        truth[i] = index.list_rows[top]
+    tag_truth = np.asarray(exact.ids[sample, :k]) if exact is not None else None
+
+    results = []
+    for nprobe in nprobes:
+        if nprobe > index.nlist:
+            break
+        found = np.full((len(sample), k), MISSING, dtype=np.int32)
+        latencies = np.empty(len(sample))
+        for i, row in enumerate(sample):
+            began = time.perf_counter()
+            ids, _ = index.neighbors(int(row), k, nprobe)
+            latencies[i] = time.perf_counter() - began
+            found[i, :len(ids)] = ids
+        results.append({
+            'nprobe': nprobe,
+            'recall_vs_exact_embedding': recall_at_k(found, truth),
+            'recall_vs_tag_index': recall_at_k(found, tag_truth) if tag_truth is not None else None,
+            'p50_ms': float(np.percentile(latencies, 50) * 1000),
+            'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        })
+    return results
+
+
+def main():
+    from build_similarity import load_model
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--model', default=NEIGHBOR_INDEX_DIR,
+                        help="directory with tag_matrix.npz (written by build_similarity.py)")
+    common.add_argument('--out', default=ANN_INDEX_DIR, help="ANN index directory")
+
+    parser = argparse.ArgumentParser(description="Build or benchmark the approximate nearest-neighbor index.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_parser = sub.add_parser('build', parents=[common], help="embed the tag matrix and build the IVF index")
+    build_parser.add_argument('--dimensions', type=int, default=DIMENSIONS, help="SVD dimensions")
+    build_parser.add_argument('--nlist', type=int, help="number of IVF lists (default: sqrt(N))")
+    build_parser.add_argument('--nprobe', type=int, default=NPROBE, help="default lists scanned per query")
+    bench_parser = sub.add_parser('bench', parents=[common], help="recall@k and latency per nprobe")
+    bench_parser.add_argument('--k', type=int, default=10)
+    bench_parser.add_argument('--queries', type=int, default=500)
+    bench_parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        _, matrix, _ = load_model(args.model)
+        began = time.perf_counter()
+        index = AnnIndex.build(matrix, args.dimensions, args.nlist, args.nprobe)
+        index.save(args.out)
+        logger.info(f"Built {len(index)} x {index.vectors.shape[1]} ANN index with {index.nlist} lists "
+                    f"in {time.perf_counter() - began:.1f}s -> {args.out}")
+    else:
+        index = AnnIndex.load(args.out, mmap=False)
+        exact = NeighborIndex.load(args.model) if os.path.exists(os.path.join(args.model, 'ids.npy')) else None
+        print(f"{'nprobe':>6} {'recall(emb)':>11} {'recall(tags)':>12} {'p50 ms':>7} {'p99 ms':>7}")
+        for r in bench(index, exact, args.k, args.queries, args.nprobe):
+            tags = f"{r['recall_vs_tag_index']:.3f}" if r['recall_vs_tag_index'] is not None else 'n/a'
+            print(f"{r['nprobe']:>6} {r['recall_vs_exact_embedding']:>11.3f} {tags:>12} "
+                  f"{r['p50_ms']:>7.3f} {r['p99_ms']:>7.3f}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,246 @@
+import os
+import time
+import shutil
+import argparse
+import logging
+import threading
+from typing import TYPE_CHECKING, NamedTuple, Optional, Tuple, Union
+
+from catalog import Catalog, CATALOG_DIR, MOVIES_FILE, MOVIE_IDS_FILE, _atomic_write, build as build_catalog
+from neighbor_index import NeighborIndex, NEIGHBOR_INDEX_DIR
+from title_index import TitleIndex
+
+if TYPE_CHECKING:
+    from ann_index import AnnIndex
+
+# Serving data (catalog, neighbor index, title index), loaded once per process.
+# app.py calls preload() before the login screen so loading overlaps with it,
+# and get() once the page actually needs the data.
+#
+# Published versions live side by side and a one-line CURRENT file names the
+# live one:
+#
+#   artifacts/CURRENT                     "20260101-120000-4242"
+#   artifacts/<version>/catalog/          see catalog.py
+#   artifacts/<version>/neighbor_index/   see neighbor_index.py
+#   artifacts/<version>/ann_index/        see ann_index.py
+#
+# Arrays are memory-mapped read-only, so every worker on the host shares the
+# same page-cache pages. Publishing writes a new version directory and then
+# replaces CURRENT atomically; workers notice within RELOAD_CHECK_INTERVAL
+# and switch on their next get(), without a restart. Without a CURRENT file
+# the unversioned catalog/, neighbor_index/
+# and ann_index/ directories are served.
+#
+#   python artifacts.py publish               # full build into a new version
+#   python artifacts.py update batch.json     # copy CURRENT, apply a batch, publish
+#   python artifacts.py rollback [VERSION]
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS_ROOT = os.getenv("ARTIFACTS_ROOT", "artifacts")
+CURRENT_FILE = 'CURRENT'
+KEEP_VERSIONS = 3  # older versions are deleted on publish; the live one is always kept
+RELOAD_CHECK_INTERVAL = float(os.getenv("ARTIFACTS_CHECK_INTERVAL", "10"))  # seconds
+# 'neighbors': exact precomputed top-K lists; 'ann': IVF search over SVD embeddings
+RECOMMENDER_ENGINE = os.getenv("RECOMMENDER_ENGINE", "neighbors")
+# ann_index.ANN_INDEX_DIR; ann_index itself is only imported for the 'ann'
+# engine, since it pulls in scipy and the default engine never needs it
+ANN_INDEX_DIR = 'ann_index'
+
+
+class Artifacts(NamedTuple):
+    catalog: Catalog
+    neighbors: Union[NeighborIndex, 'AnnIndex']
+    title_index: TitleIndex
+    version: Optional[str] = None
+
+
+_artifacts: Optional[Artifacts] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+_preloading: Optional[threading.Thread] = None
+
+
+# --- Versions ---
+def current_version(root: str = ARTIFACTS_ROOT) -> Optional[str]:
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def artifact_dirs(version: Optional[str], root: str = ARTIFACTS_ROOT) -> Tuple[str, str, str]:
+    """(catalog, neighbor index, ANN index) dirs of a version; the unversioned dirs for None."""
+    base = '' if version is None else os.path.join(root, version)
+    return tuple(os.path.join(base, name) for name in (CATALOG_DIR, NEIGHBOR_INDEX_DIR, ANN_INDEX_DIR))
+
+
+def list_versions(root: str = ARTIFACTS_ROOT) -> list:
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+
+
+def new_version(root: str = ARTIFACTS_ROOT) -> str:
+    base = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    version, attempt = base, 0
+    while True:
+        try:
+            os.makedirs(os.path.join(root, version))
+            return version
+        except FileExistsError:
+            # Another version from this process within the same second; the suffix still sorts after it
+            attempt += 1
+            version = f"{base}-{attempt}"
+
+
+def publish(version: str, root: str = ARTIFACTS_ROOT, keep: int = KEEP_VERSIONS):
+    """Point CURRENT at `version` in one atomic rename, then drop old versions."""
+    if not os.path.isdir(os.path.join(root, version)):
+        raise ValueError(f"No version {version} in {root}")
+    _atomic_write(os.path.join(root, CURRENT_FILE), lambda f: f.write(f"{version}\n".encode()))
+    logger.info(f"Published {version}")
+
+    # Workers that still map a deleted version keep working; the files go away when they unmap
+    for old in list_versions(root)[:-keep]:
+        if old != version:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+            logger.info(f"Removed old version {old}")
+
+
+# --- Loading ---
+def load(version: Optional[str] = None, root: str = ARTIFACTS_ROOT, engine: str = RECOMMENDER_ENGINE) -> Artifacts:
+    began = time.perf_counter()
+    catalog_dir, neighbor_dir, ann_dir = artifact_dirs(version, root)
+    if version is None and not os.path.exists(os.path.join(catalog_dir, MOVIE_IDS_FILE)):
+        logger.info(f"No catalog in {catalog_dir}, building it from the pickle")
+        build_catalog(out_dir=catalog_dir)
+    catalog = Catalog.load(catalog_dir)
+    if engine == 'ann':
+        from ann_index import AnnIndex
+        index_dir, neighbors = ann_dir, AnnIndex.load(ann_dir)
+    elif engine == 'neighbors':
+        index_dir, neighbors = neighbor_dir, NeighborIndex.load(neighbor_dir)
+    else:
+        raise ValueError(f"Unknown RECOMMENDER_ENGINE {engine!r}")
+    if len(neighbors) != len(catalog):
+        raise ValueError(f"{index_dir} has {len(neighbors)} rows but {catalog_dir} has {len(catalog)} movies")
+    title_index = TitleIndex(catalog.titles)
+    logger.info(f"Loaded {len(catalog)} movies (version {version or 'unversioned'}) "
+                f"in {(time.perf_counter() - began) * 1000:.0f} ms")
+    return Artifacts(catalog, neighbors, title_index, version)
+
+
+def get() -> Artifacts:
+    """The live artifacts; waits for a preload in progress, or loads them now.
+
+    Once loaded, CURRENT is re-read at most every RELOAD_CHECK_INTERVAL. The
+    thread that sees a new version loads it while other sessions keep using
+    the old one, and a version that fails to load is logged and skipped.
+    """
+    global _artifacts, _checked_at
+    if _artifacts is not None:
+        if time.monotonic() - _checked_at < RELOAD_CHECK_INTERVAL or not _lock.acquire(blocking=False):
+            return _artifacts
+    else:
+        _lock.acquire()
+    try:
+        if _artifacts is None or time.monotonic() - _checked_at >= RELOAD_CHECK_INTERVAL:
+            version = current_version()
+            if _artifacts is None:
+                _artifacts = load(version)
+            elif version != _artifacts.version:
+                try:
+                    _artifacts = load(version)
+                except Exception as e:
+                    logger.error(f"Keeping version {_artifacts.version}; failed to load {version}: {e}")
+            _checked_at = time.monotonic()
+        return _artifacts
+    finally:
+        _lock.release()
+
+
+def preload():
+    """Start loading in the background; returns immediately."""
+    global _preloading
+    if _artifacts is not None or _preloading is not None:
+        return
+
+    def run():
+        try:
+            get()
+        except Exception as e:
+            # get() on the request path retries and surfaces the error
+            logger.error(f"Background load failed: {e}")
+
+    _preloading = threading.Thread(target=run, name="artifacts-preload", daemon=True)
+    _preloading.start()
+
+
+# --- Publishing CLI ---
+def main():
+    import json
+    import build_similarity
+    from ann_index import AnnIndex
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--root', default=ARTIFACTS_ROOT, help="directory holding the versions and CURRENT")
+    common.add_argument('--movies', default=MOVIES_FILE, help="catalog pickle (movie_id, title, tags)")
+    common.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes")
+
+    parser = argparse.ArgumentParser(description="Build, publish and roll back versioned serving artifacts.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('publish', parents=[common], help="full build into a new version, then make it live")
+    update_parser = sub.add_parser('update', parents=[common], help="apply a batch to a copy of the live version")
+    update_parser.add_argument('batch', help="JSON file with the new or changed movies")
+    rollback_parser = sub.add_parser('rollback', parents=[common], help="make an older version live again")
+    rollback_parser.add_argument('version', nargs='?', help="version to restore (default: the one before CURRENT)")
+    sub.add_parser('list', parents=[common], help="show versions")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        live = current_version(args.root)
+        for version in list_versions(args.root):
+            print(f"{'*' if version == live else ' '} {version}")
+        return
+
+    if args.command == 'rollback':
+        version = args.version
+        if version is None:
+            older = [v for v in list_versions(args.root) if v < (current_version(args.root) or '')]
+            if not older:
+                parser.error("no older version to roll back to")
+            version = older[-1]
+        publish(version, args.root, keep=len(list_versions(args.root)))
+        return
+
+    version = new_version(args.root)
+    catalog_dir, neighbor_dir, ann_dir = artifact_dirs(version, args.root)
+    try:
+        if args.command == 'publish':
+            build_similarity.build(args.movies, neighbor_dir, workers=args.workers, catalog_dir=catalog_dir)
+        else:
+            live = current_version(args.root)
+            if live is None:
+                parser.error("nothing published yet; run publish first")
+            shutil.copytree(os.path.join(args.root, live), os.path.join(args.root, version), dirs_exist_ok=True)
+            with open(args.batch) as f:
+                # The copied catalog is the movie list: movies_dict.pkl may belong to another version
+                build_similarity.update(json.load(f), None, neighbor_dir, workers=args.workers,
+                                        catalog_dir=catalog_dir)
+        # Rebuilt rather than patched: a few seconds for this catalog, and the lists stay balanced
+        _, matrix, _ = build_similarity.load_model(neighbor_dir)
+        AnnIndex.build(matrix).save(ann_dir)
+        for engine in ('neighbors', 'ann'):
+            load(version, args.root, engine)  # refuse to publish something workers can't load
+    except BaseException:
+        shutil.rmtree(os.path.join(args.root, version), ignore_errors=True)
+        raise
+    publish(version, args.root)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,439 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import logging
+import platform
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+from requests.adapters import BaseAdapter
+
+# Micro-benchmarks for the request hot paths, each run in isolation:
+# title lookups, recommendations (exact and ANN engines), TMDB metadata cache
+# hits and misses, the poster store, and the db_auth calls. TMDB is answered
+# in-process by StubTMDBAdapter and the database is a throwaway SQLite file,
+# so no network, API key or MySQL server is needed.
+#
+#   python benchmark.py run                                  # print the table
+#   python benchmark.py run --save benchmark_baseline.json   # record a baseline
+#   python benchmark.py run --compare benchmark_baseline.json
+#   python benchmark.py run --only tmdb db_auth              # cases whose name contains any of these
+#
+# --compare exits with status 1 when a case got slower or hungrier than the
+# baseline by more than --threshold, so it can gate a CI job.
+
+logger = logging.getLogger(__name__)
+
+BASELINE_FILE = 'benchmark_baseline.json'
+WARMUP = 20
+MEMORY_ITERATIONS = 50  # tracemalloc slows every allocation, so peak memory gets its own shorter pass
+REGRESSION_THRESHOLD = 0.25  # relative slowdown that counts as a regression
+NOISE_FLOOR_MS = 0.02  # latency differences below this are timer noise, never regressions
+NOISE_FLOOR_KIB = 64
+SEED = 0
+
+
+# --- Stubbed TMDB ---
+def movie_payload(movie_id: int) -> dict:
+    """A /movie/{id} response with every field tmdb.refresh_movie_data reads."""
+    return {
+        'id': movie_id,
+        'title': f"Movie {movie_id}",
+        'poster_path': f"/{movie_id}.jpg",
+        'release_date': '2009-12-15',
+        'overview': "In the 22nd century, a paraplegic Marine is dispatched to the moon Pandora "
+                    "on a unique mission, but becomes torn between following orders and "
+                    "protecting an alien civilization.",
+        'genres': [{'id': 28, 'name': 'Action'}, {'id': 12, 'name': 'Adventure'},
+                   {'id': 14, 'name': 'Fantasy'}, {'id': 878, 'name': 'Science Fiction'}],
+        'runtime': 162,
+        'vote_average': 7.593,
+    }
+
+
+class StubTMDBAdapter(BaseAdapter):
+    """Answers /movie/{id} in-process after `latency` seconds; anything else is a 404."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls = 0
+
+    def send(self, request, **kwargs) -> requests.Response:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.headers['Content-Type'] = 'application/json'
+        head, _, movie_id = urlparse(request.url).path.rpartition('/')
+        if head.endswith('/movie') and movie_id.isdigit():
+            response.status_code = 200
+            response._content = json.dumps(movie_payload(int(movie_id))).encode()
+        else:
+            response.status_code = 404
+            response._content = b'{"status_code": 34}'
+        return response
+
+    def close(self):
+        pass
+
+
+# --- Cases ---
+# A case's setup runs once, untimed, and returns op(i); i is unique per call so
+# cases that need a cold key (a cache miss, a new user) can derive one from it.
+class Case(NamedTuple):
+    name: str
+    setup: Callable[[], Callable[[int], object]]
+    iterations: int
+
+
+def _typo(title: str, rng: np.random.Generator) -> str:
+    if len(title) < 4:
+        return title
+    i = int(rng.integers(1, len(title) - 2))
+    return title[:i] + title[i + 1] + title[i] + title[i + 2:]
+
+
+def recommendation_cases(artifacts_root: str) -> List[Case]:
+    import artifacts
+    import recommender
+
+    version = artifacts.current_version(artifacts_root)
+    loaded = {}
+
+    def engine(name):
+        if name not in loaded:
+            loaded[name] = artifacts.load(version, artifacts_root, engine=name)
+        return loaded[name]
+
+    def sample_titles(count):
+        titles = engine('neighbors').catalog.titles
+        rng = np.random.default_rng(SEED)
+        return [titles[i] for i in rng.choice(len(titles), count, replace=False)]
+
+    def lookup(make_queries):
+        def setup():
+            title_index = engine('neighbors').title_index
+            queries = make_queries()
+            return lambda i: title_index.lookup(queries[i % len(queries)])
+        return setup
+
+    def exact_titles():
+        return sample_titles(200)
+
+    def typos():
+        rng = np.random.default_rng(SEED)
+        return [_typo(title, rng) for title in sample_titles(200)]
+
+    def recommend_one(name):
+        def setup():
+            served = engine(name)
+            titles = sample_titles(200)
+            return lambda i: recommender.recommend_many(served.title_index, served.neighbors,
+                                                        [titles[i % len(titles)]], 5)
+        return setup
+
+    def recommend_blended(name):
+        def setup():
+            served = engine(name)
+            titles = sample_titles(201)
+            return lambda i: recommender.recommend_blended(served.title_index, served.neighbors,
+                                                           titles[(i * 3) % 201:(i * 3) % 201 + 3], 5)
+        return setup
+
+    return [
+        Case('title_index.lookup exact', lookup(exact_titles), 2000),
+        Case('title_index.lookup typo', lookup(typos), 500),
+        Case('recommend_many neighbors', recommend_one('neighbors'), 2000),
+        Case('recommend_blended neighbors', recommend_blended('neighbors'), 2000),
+        Case('recommend_many ann', recommend_one('ann'), 2000),
+        Case('recommend_blended ann', recommend_blended('ann'), 2000),
+    ]
+
+
+def tmdb_cases(tmdb_latency: float) -> List[Case]:
+    def client():
+        import tmdb
+        from rate_limiter import TokenBucket
+        adapter = StubTMDBAdapter(tmdb_latency)
+        tmdb.session.mount("https://", adapter)
+        tmdb.session.mount("http://", adapter)
+        # The stub has no quota; the real limiter would dominate every miss
+        tmdb.rate_limiter = TokenBucket(1e9, 10 ** 9)
+        return tmdb
+
+    def hit():
+        tmdb = client()
+        movie_ids = list(range(1, 201))
+        tmdb.fetch_movie_data_many(movie_ids)
+        return lambda i: tmdb.fetch_movie_data(movie_ids[i % len(movie_ids)])
+
+    def miss():
+        tmdb = client()
+        return lambda i: tmdb.fetch_movie_data(1_000_000 + i)
+
+    def miss_many():
+        tmdb = client()
+        return lambda i: tmdb.fetch_movie_data_many([2_000_000 + i * 5 + j for j in range(5)])
+
+    return [
+        Case('tmdb.fetch_movie_data hit', hit, 5000),
+        Case('tmdb.fetch_movie_data miss', miss, 500),
+        Case('tmdb.fetch_movie_data_many 5 misses', miss_many, 200),
+    ]
+
+
+def poster_store_cases(poster_json: str) -> List[Case]:
+    from poster_store import PosterStore
+
+    def import_json():
+        # The legacy load_poster_cache(): read the whole JSON file into a store
+        logging.getLogger('poster_store').setLevel(logging.WARNING)  # one "Imported" line per call
+
+        def op(i):
+            path = f"import-{i}.db"
+            store = PosterStore(path, flush_interval=3600)
+            store.import_json(poster_json)
+            store.close()
+            os.remove(path)
+        return op
+
+    def get():
+        store = PosterStore('posters-get.db')
+        for movie_id in range(1000):
+            store.put(movie_id, movie_payload(movie_id))
+        store.flush()
+        return lambda i: store.get(i % 1000)
+
+    def put_flush():
+        # The legacy save_poster_cache(): persist a batch of new entries
+        store = PosterStore('posters-put.db', flush_interval=3600)
+
+        def op(i):
+            for j in range(100):
+                store.put(i * 100 + j, movie_payload(j))
+            store.flush()
+        return op
+
+    return [
+        Case('poster_store.import_json', import_json, 20),
+        Case('poster_store.get', get, 5000),
+        Case('poster_store.put 100 + flush', put_flush, 200),
+    ]
+
+
+def db_auth_cases(db_path: str) -> List[Case]:
+    def client():
+        import db
+        import db_auth
+        db.set_backend(db.SQLiteBackend(db_path))
+        db_auth.init_db()
+        return db_auth
+
+    def add_user():
+        db_auth = client()
+        return lambda i: db_auth.add_user(f"bench-new-{i}", "correct horse")
+
+    def check_user():
+        db_auth = client()
+        db_auth.add_user("bench-login", "correct horse")
+        return lambda i: db_auth.check_user("bench-login", "correct horse")
+
+    def add_search():
+        db_auth = client()
+        return lambda i: db_auth.add_search(f"bench-{i % 50}", i, f"Movie {i}")
+
+    def recent_history():
+        db_auth = client()
+        for i in range(2000):
+            db_auth.add_search(f"bench-{i % 50}", i, f"Movie {i}")
+            db_auth.add_genre_search(f"bench-{i % 50}", f"Genre {i % 19}")
+        db_auth.flush_history()
+        return lambda i: db_auth.get_recent_history(f"bench-{i % 50}")
+
+    def flush_history():
+        db_auth = client()
+
+        def op(i):
+            for j in range(100):
+                db_auth.add_search(f"bench-{j % 10}", i * 100 + j, f"Movie {j}")
+            db_auth.flush_history()
+        return op
+
+    return [
+        # Both go through bcrypt at BCRYPT_ROUNDS, so expect hundreds of milliseconds
+        Case('db_auth.add_user', add_user, 10),
+        Case('db_auth.check_user', check_user, 10),
+        Case('db_auth.add_search', add_search, 5000),
+        Case('db_auth.get_recent_history', recent_history, 1000),
+        Case('db_auth.flush_history 100 rows', flush_history, 100),
+    ]
+
+
+# --- Measurement ---
+def measure(op: Callable[[int], object], iterations: int, warmup: int = WARMUP,
+            memory_iterations: int = MEMORY_ITERATIONS) -> dict:
+    """Latency percentiles and throughput over `iterations` calls, then peak memory over a few more."""
+    for i in range(warmup):
+        op(i)
+
+    latencies = np.empty(iterations)
+    began = time.perf_counter()
+    for n in range(iterations):
+        started = time.perf_counter()
+        op(warmup + n)
+        latencies[n] = time.perf_counter() - started
+    elapsed = time.perf_counter() - began
+
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        for n in range(min(iterations, memory_iterations)):
+            op(warmup + iterations + n)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        'iterations': iterations,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'ops_per_s': iterations / elapsed,
+        'peak_kib': max(0, peak - baseline) / 1024,
+    }
+
+
+def run(cases: List[Case]) -> Dict[str, dict]:
+    results = {}
+    for case in cases:
+        try:
+            op = case.setup()
+        except (ImportError, FileNotFoundError) as e:
+            logger.warning(f"Skipping {case.name}: {e}")
+            continue
+        results[case.name] = measure(op, case.iterations)
+        logger.info(f"{case.name}: p50 {results[case.name]['p50_ms']:.3f} ms")
+    return results
+
+
+# --- Baselines ---
+def environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def save_baseline(path: str, results: Dict[str, dict]):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved {len(results)} results to {path}")
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict],
+            threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Names of cases whose p50, p95 or peak memory grew by more than `threshold`."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        slower = any(result[key] > before[key] * (1 + threshold) and result[key] - before[key] > NOISE_FLOOR_MS
+                     for key in ('p50_ms', 'p95_ms'))
+        hungrier = (result['peak_kib'] > before['peak_kib'] * (1 + threshold)
+                    and result['peak_kib'] - before['peak_kib'] > NOISE_FLOOR_KIB)
+        if slower or hungrier:
+            regressions.append(name)
+    return regressions
+
+
+def print_table(results: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None,
+                regressions: List[str] = ()):
+    width = max([len(name) for name in results] + [4])
+    header = f"{'case':<{width}} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10} {'peak KiB':>9}"
+    if baseline is not None:
+        header += f" {'p50 vs base':>11}"
+    print(header)
+    for name, r in results.items():
+        line = (f"{name:<{width}} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+                f"{r['ops_per_s']:>10.0f} {r['peak_kib']:>9.1f}")
+        if baseline is not None:
+            before = baseline.get(name)
+            change = f"{(r['p50_ms'] / before['p50_ms'] - 1) * 100:+.0f}%" if before and before['p50_ms'] else 'new'
+            line += f" {change:>11}"
+            if name in regressions:
+                line += "  REGRESSION"
+        print(line)
+
+
+def main():
+    import artifacts
+
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the recommendation hot paths.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run', help="run the benchmarks and print p50/p95/p99, throughput, peak memory")
+    run_parser.add_argument('--only', nargs='+', help="run cases whose name contains any of these")
+    run_parser.add_argument('--root', default=artifacts.ARTIFACTS_ROOT, help="published artifacts directory")
+    run_parser.add_argument('--posters', default='poster_cache.json', help="legacy JSON cache to import")
+    run_parser.add_argument('--tmdb-latency', type=float, default=0.0,
+                            help="milliseconds the stubbed TMDB waits before answering")
+    run_parser.add_argument('--save', metavar='PATH', nargs='?', const=BASELINE_FILE,
+                            help="write the results as a baseline (default path: %(const)s)")
+    run_parser.add_argument('--compare', metavar='PATH', nargs='?', const=BASELINE_FILE,
+                            help="compare with a saved baseline (default path: %(const)s)")
+    run_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                            help="relative slowdown reported as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    artifacts_root = os.path.abspath(args.root)
+    poster_json = os.path.abspath(args.posters)
+    save_path = os.path.abspath(args.save) if args.save else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    # tmdb.py and the poster store create their SQLite files in the working
+    # directory, so run in a scratch one and leave the real caches alone
+    workdir = tempfile.mkdtemp(prefix='movie-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        cases = (recommendation_cases(artifacts_root) + tmdb_cases(args.tmdb_latency / 1000)
+                 + poster_store_cases(poster_json) + db_auth_cases(os.path.join(workdir, 'movies_db.db')))
+        if args.only:
+            cases = [case for case in cases if any(pattern in case.name for pattern in args.only)]
+        results = run(cases)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = compare(results, baseline, args.threshold) if baseline is not None else []
+    print_table(results, baseline, regressions)
+    if save_path:
+        save_baseline(save_path, results)
+    if regressions:
+        logger.error(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,350 @@
+import os
+import re
+import json
+import argparse
+import logging
+import pickle as pkl
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Tuple, Optional
+
+import numpy as np
+import scipy.sparse as sp
+
+from catalog import Catalog, CATALOG_DIR
+from neighbor_index import NeighborIndex, NEIGHBOR_INDEX_DIR, DEFAULT_K, MISSING, top_k_rows
+
+logger = logging.getLogger(__name__)
+
+MOVIES_FILE = 'movies_dict.pkl'
+TAG_MATRIX_FILE = 'tag_matrix.npz'
+VOCABULARY_FILE = 'vocabulary.json'
+MAX_FEATURES = 5000
+BLOCK_SIZE = 1024
+
+# Same tokenization as a default CountVectorizer: words of 2+ characters
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had has
+have having he her here hers herself him himself his how if in into is it its itself just me more
+most my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves
+""".split())
+
+
+# --- Vectorization ---
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def fit_vocabulary(tags: List[str], max_features: int = MAX_FEATURES) -> Dict[str, int]:
+    """Keep the `max_features` most frequent terms, indexed in alphabetical order."""
+    counts = Counter()
+    for text in tags:
+        counts.update(tokenize(text))
+    top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:max_features]
+    return {term: i for i, term in enumerate(sorted(term for term, _ in top))}
+
+
+def vectorize(tags: List[str], vocabulary: Dict[str, int]) -> sp.csr_matrix:
+    """Term counts per movie, L2-normalized so a dot product is cosine similarity."""
+    indptr = [0]
+    indices = []
+    data = []
+    for text in tags:
+        counts = Counter(vocabulary[t] for t in tokenize(text) if t in vocabulary)
+        indices.extend(counts.keys())
+        data.extend(counts.values())
+        indptr.append(len(indices))
+    matrix = sp.csr_matrix((np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), indptr),
+                           shape=(len(tags), len(vocabulary)))
+    matrix.sort_indices()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.csr_matrix(sp.diags(1.0 / norms).astype(np.float32) @ matrix)
+
+
+# --- Blocked neighbor computation ---
+# Each task scores one block of rows against the catalog one column block at a
+# time, so the largest dense array is block_size x block_size float32 per
+# worker, whatever the catalog size.
+_worker_matrix = None
+_worker_matrix_t = None
+
+
+def _init_worker(matrix: sp.csr_matrix):
+    global _worker_matrix, _worker_matrix_t
+    _worker_matrix = matrix
+    _worker_matrix_t = matrix.T.tocsc()
+
+
+def merge_top_k(ids: np.ndarray, scores: np.ndarray, more_ids: np.ndarray, more_scores: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge two sets of per-row candidates (MISSING ids ignored) into the top k."""
+    cand_ids = np.hstack([ids, more_ids])
+    cand_scores = np.hstack([scores, more_scores]).astype(np.float32)
+    cand_scores[cand_ids == MISSING] = -np.inf
+    order = np.lexsort((cand_ids, -cand_scores), axis=1)[:, :k]
+    top_ids = np.take_along_axis(cand_ids, order, axis=1)
+    top_scores = np.take_along_axis(cand_scores, order, axis=1)
+    empty = ~np.isfinite(top_scores)
+    top_ids[empty] = MISSING
+    top_scores[empty] = 0.0
+    return top_ids, top_scores
+
+
+def _block_neighbors(rows: np.ndarray, k: int, block_size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    n = _worker_matrix.shape[0]
+    vectors = _worker_matrix[rows]
+    ids = np.full((len(rows), k), MISSING, dtype=np.int32)
+    scores = np.zeros((len(rows), k), dtype=np.float32)
+    for col_start in range(0, n, block_size):
+        col_end = min(col_start + block_size, n)
+        tile = (vectors @ _worker_matrix_t[:, col_start:col_end]).toarray()
+        tile_ids, tile_scores = top_k_rows(tile, k, self_cols=rows - col_start)
+        tile_ids[tile_ids != MISSING] += col_start
+        ids, scores = merge_top_k(ids, scores, tile_ids, tile_scores, k)
+    return rows, ids, scores
+
+
+def fill_neighbors(index: NeighborIndex, matrix: sp.csr_matrix, rows: np.ndarray,
+                   block_size: int = BLOCK_SIZE, workers: int = 1):
+    """(Re)compute the neighbor lists of `rows` in place, in blocks across `workers` processes."""
+    blocks = [rows[start:start + block_size] for start in range(0, len(rows), block_size)]
+    if workers <= 1:
+        _init_worker(matrix)
+        for block in blocks:
+            _store_block(index, *_block_neighbors(block, index.k, block_size))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(matrix,)) as pool:
+        # Keep a bounded number of blocks in flight so finished results never pile up
+        pending = set()
+        done_rows = 0
+        for block in blocks:
+            pending.add(pool.submit(_block_neighbors, block, index.k, block_size))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    done_rows += _store_block(index, *future.result())
+                logger.info(f"Neighbors: {done_rows}/{len(rows)} rows")
+        for future in pending:
+            _store_block(index, *future.result())
+
+
+def _store_block(index: NeighborIndex, rows: np.ndarray, ids: np.ndarray, scores: np.ndarray) -> int:
+    index.ids[rows] = ids
+    index.scores[rows] = scores
+    return len(rows)
+
+
+def compute_neighbors(matrix: sp.csr_matrix, k: int = DEFAULT_K, block_size: int = BLOCK_SIZE,
+                      workers: int = 1, out_dir: Optional[str] = None) -> NeighborIndex:
+    """Top-k cosine neighbors for every row.
+
+    With `out_dir`, finished blocks are streamed into memory-mapped files there
+    instead of being held in RAM.
+    """
+    n = matrix.shape[0]
+    if out_dir:
+        index = NeighborIndex.create(out_dir, n, k)
+    else:
+        index = NeighborIndex(np.empty((n, k), dtype=np.int32), np.empty((n, k), dtype=np.float32))
+    fill_neighbors(index, matrix, np.arange(n), block_size, workers)
+    if out_dir:
+        index.commit(out_dir)
+    return index
+
+
+# --- Artifact I/O ---
+def load_movies(path: str = MOVIES_FILE) -> Tuple[List[int], List[str], List[str]]:
+    with open(path, 'rb') as f:
+        movies_dict = pkl.load(f)
+    order = sorted(movies_dict['movie_id'].keys())
+    return ([int(movies_dict['movie_id'][i]) for i in order],
+            [movies_dict['title'][i] for i in order],
+            [movies_dict['tags'][i] for i in order])
+
+
+def load_catalog_movies(catalog_dir: str = CATALOG_DIR) -> Tuple[List[int], List[str], List[str]]:
+    """Same lists as load_movies, from a saved columnar catalog."""
+    catalog = Catalog.load(catalog_dir)
+    return [int(movie_id) for movie_id in catalog.movie_ids], list(catalog.titles), catalog.tags.tolist()
+
+
+def save_movies(movie_ids: List[int], titles: List[str], tags: List[str], path: str = MOVIES_FILE):
+    # Same column -> {row: value} layout as DataFrame.to_dict()
+    movies_dict = {
+        'movie_id': dict(enumerate(movie_ids)),
+        'title': dict(enumerate(titles)),
+        'tags': dict(enumerate(tags)),
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pkl.dump(movies_dict, f)
+    os.replace(tmp_path, path)
+
+
+def save_model(out_dir: str, vocabulary: Dict[str, int], matrix: sp.csr_matrix):
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = os.path.join(out_dir, VOCABULARY_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(vocabulary, f)
+    os.replace(tmp_path, os.path.join(out_dir, VOCABULARY_FILE))
+    tmp_path = os.path.join(out_dir, TAG_MATRIX_FILE + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        sp.save_npz(f, matrix)
+    os.replace(tmp_path, os.path.join(out_dir, TAG_MATRIX_FILE))
+
+
+def load_model(out_dir: str) -> Tuple[Dict[str, int], sp.csr_matrix, NeighborIndex]:
+    with open(os.path.join(out_dir, VOCABULARY_FILE)) as f:
+        vocabulary = json.load(f)
+    matrix = sp.load_npz(os.path.join(out_dir, TAG_MATRIX_FILE)).tocsr()
+    index = NeighborIndex.load(out_dir, mmap=False)
+    return vocabulary, matrix, index
+
+
+# --- Full build ---
+def build(movies_path: str = MOVIES_FILE, out_dir: str = NEIGHBOR_INDEX_DIR, k: int = DEFAULT_K,
+          max_features: int = MAX_FEATURES, block_size: int = BLOCK_SIZE, workers: int = 1,
+          catalog_dir: str = CATALOG_DIR) -> NeighborIndex:
+    movie_ids, titles, tags = load_movies(movies_path)
+    vocabulary = fit_vocabulary(tags, max_features)
+    matrix = vectorize(tags, vocabulary)
+    save_model(out_dir, vocabulary, matrix)
+    index = compute_neighbors(matrix, k, block_size, workers, out_dir=out_dir)
+    Catalog.save(catalog_dir, movie_ids, titles, tags)
+    logger.info(f"Built {len(index)} x {index.k} neighbor index over {len(vocabulary)} terms in {out_dir}")
+    return index
+
+
+# --- Incremental update ---
+def merge_new_columns(index: NeighborIndex, matrix: sp.csr_matrix, changed: np.ndarray,
+                      block_size: int = BLOCK_SIZE) -> np.ndarray:
+    """Fold the scores against `changed` rows into every other row's top-K list.
+
+    Rows whose list referenced a changed row carry a stale score and cannot be
+    merged exactly; their row numbers are returned so the caller recomputes them.
+    """
+    n, k = index.ids.shape
+    changed_t = matrix[changed].T.tocsc()
+    is_changed = np.zeros(n, dtype=bool)
+    is_changed[changed] = True
+    stale = []
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        ids = index.ids[start:end]
+        scores = index.scores[start:end]
+        referenced = np.any(is_changed[np.where(ids == MISSING, 0, ids)] & (ids != MISSING), axis=1)
+        stale.extend(start + np.flatnonzero(referenced))
+
+        new_scores = (matrix[start:end] @ changed_t).toarray()
+        rows = np.arange(start, end)
+        new_scores[changed[None, :] == rows[:, None]] = -np.inf
+        new_ids = np.broadcast_to(changed.astype(np.int32), new_scores.shape)
+        index.ids[start:end], index.scores[start:end] = merge_top_k(ids, scores, new_ids, new_scores, k)
+    return np.asarray(stale, dtype=np.int64)
+
+
+def update(new_movies: List[dict], movies_path: Optional[str] = MOVIES_FILE, out_dir: str = NEIGHBOR_INDEX_DIR,
+           block_size: int = BLOCK_SIZE, workers: int = 1, catalog_dir: str = CATALOG_DIR) -> NeighborIndex:
+    """Add or update a batch of movies without rebuilding all N^2 pairs.
+
+    Each entry needs `movie_id`, `title` and `tags`. The vocabulary stays fixed
+    between full builds, so unknown terms in new tags are ignored.
+
+    The movie list is read from and written back to `movies_path`. With
+    movies_path=None it comes from the catalog in `catalog_dir` instead, and
+    nothing outside `out_dir` and `catalog_dir` is written: versioned
+    artifacts then never depend on the shared pickle.
+    """
+    if movies_path is None:
+        movie_ids, titles, tags = load_catalog_movies(catalog_dir)
+    else:
+        movie_ids, titles, tags = load_movies(movies_path)
+    vocabulary, matrix, index = load_model(out_dir)
+    if matrix.shape[0] != len(movie_ids):
+        source = movies_path or catalog_dir
+        raise ValueError(f"{out_dir} covers {matrix.shape[0]} movies but {source} has {len(movie_ids)}; run a full build")
+
+    position = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+    changed = []
+    for movie in new_movies:
+        movie_id = int(movie['movie_id'])
+        row = position.get(movie_id)
+        if row is None:
+            row = position[movie_id] = len(movie_ids)
+            movie_ids.append(movie_id)
+            titles.append(movie['title'])
+            tags.append(movie['tags'])
+        else:
+            titles[row] = movie['title']
+            tags[row] = movie['tags']
+        changed.append(row)
+    changed = np.unique(np.asarray(changed, dtype=np.int64))
+    if len(changed) == 0:
+        return index
+
+    # Swap in the new tag vectors; appended rows go at the end
+    old_n = matrix.shape[0]
+    n = len(movie_ids)
+    new_rows = vectorize([tags[i] for i in changed], vocabulary)
+    source = np.arange(n)
+    source[changed] = old_n + np.arange(len(changed))
+    matrix = sp.vstack([matrix, new_rows]).tocsr()[source]
+
+    ids = np.full((n, index.k), MISSING, dtype=np.int32)
+    scores = np.zeros((n, index.k), dtype=np.float32)
+    ids[:old_n] = index.ids
+    scores[:old_n] = index.scores
+    index = NeighborIndex(ids, scores)
+
+    stale = merge_new_columns(index, matrix, changed, block_size)
+    fill_neighbors(index, matrix, np.union1d(changed, stale), block_size, workers)
+
+    save_model(out_dir, vocabulary, matrix)
+    index.save(out_dir)
+    if movies_path is not None:
+        save_movies(movie_ids, titles, tags, movies_path)
+    Catalog.save(catalog_dir, movie_ids, titles, tags)
+    logger.info(f"Updated {len(changed)} movies ({n - old_n} new), recomputed {len(stale)} stale rows")
+    return index
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--movies', default=MOVIES_FILE, help="catalog pickle (movie_id, title, tags)")
+    common.add_argument('--out', default=NEIGHBOR_INDEX_DIR, help="neighbor index directory")
+    common.add_argument('--catalog', default=CATALOG_DIR, help="columnar catalog directory served by the app")
+    common.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                        help="rows/columns per scoring tile; peak memory is about block_size^2 * 4 bytes per worker")
+    common.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes")
+
+    parser = argparse.ArgumentParser(description="Build or incrementally update the movie neighbor index.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = sub.add_parser('build', parents=[common], help="vectorize all tags and rebuild every neighbor list")
+    build_parser.add_argument('--k', type=int, default=DEFAULT_K, help="neighbors kept per movie")
+    build_parser.add_argument('--max-features', type=int, default=MAX_FEATURES, help="vocabulary size")
+
+    update_parser = sub.add_parser('update', parents=[common],
+                                   help="add or update movies from a JSON list of {movie_id, title, tags}")
+    update_parser.add_argument('batch', help="JSON file with the new or changed movies")
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build(args.movies, args.out, k=args.k, max_features=args.max_features,
+              block_size=args.block_size, workers=args.workers, catalog_dir=args.catalog)
+    else:
+        with open(args.batch) as f:
+            update(json.load(f), args.movies, args.out, block_size=args.block_size, workers=args.workers,
+                   catalog_dir=args.catalog)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
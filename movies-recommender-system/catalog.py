@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import argparse
+import logging
+import subprocess
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Columnar movie catalog, written next to the neighbor index by build_similarity.py.
+#
+#   <dir>/movie_ids.npy                   int64, N
+#   <dir>/<column>.offsets.npy            int64, N + 1
+#   <dir>/<column>.utf8                   all values of a string column back to back
+#
+# Serving only needs movie_id and title, which load in a few milliseconds;
+# tags are memory-mapped on first access and decoded one value at a time.
+
+CATALOG_DIR = 'catalog'
+MOVIES_FILE = 'movies_dict.pkl'
+MOVIE_IDS_FILE = 'movie_ids.npy'
+
+
+class StringColumn:
+    """Read-only string column backed by a UTF-8 blob and an offsets array."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def load(cls, directory: str, name: str, mmap: bool = True) -> "StringColumn":
+        mmap_mode = 'r' if mmap else None
+        offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode=mmap_mode)
+        path = os.path.join(directory, f"{name}.utf8")
+        if not mmap:
+            blob = np.fromfile(path, dtype=np.uint8)
+        elif os.path.getsize(path) == 0:
+            blob = np.empty(0, dtype=np.uint8)  # mmap can't map an empty file
+        else:
+            blob = np.memmap(path, dtype=np.uint8, mode='r')
+        return cls(blob, offsets)
+
+    @staticmethod
+    def save(directory: str, name: str, values: List[str]):
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        _atomic_write(os.path.join(directory, f"{name}.utf8"), lambda f: f.write(b''.join(encoded)))
+        _atomic_write(os.path.join(directory, f"{name}.offsets.npy"), lambda f: np.save(f, offsets))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return self.blob[start:end].tobytes().decode('utf-8')
+
+    def tolist(self) -> List[str]:
+        data = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(self))]
+
+
+def _atomic_write(path: str, write):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Catalog:
+    """movie_id and title of every catalog row, in neighbor-index row order."""
+
+    def __init__(self, movie_ids: np.ndarray, titles: List[str], directory: Optional[str] = None):
+        self.movie_ids = movie_ids
+        self.titles = titles
+        self.directory = directory
+        self._tags: Optional[StringColumn] = None
+
+    def __len__(self) -> int:
+        return len(self.movie_ids)
+
+    @property
+    def tags(self) -> StringColumn:
+        """Stemmed tag strings; mapped from disk on first use, never needed to serve."""
+        if self._tags is None:
+            self._tags = StringColumn.load(self.directory, 'tags')
+        return self._tags
+
+    @classmethod
+    def load(cls, directory: str = CATALOG_DIR) -> "Catalog":
+        movie_ids = np.load(os.path.join(directory, MOVIE_IDS_FILE), mmap_mode='r')
+        titles = StringColumn.load(directory, 'title', mmap=False).tolist()
+        return cls(movie_ids, titles, directory)
+
+    @staticmethod
+    def save(directory: str, movie_ids: List[int], titles: List[str], tags: List[str]):
+        if not len(movie_ids) == len(titles) == len(tags):
+            raise ValueError("movie_ids, titles and tags must have the same length")
+        os.makedirs(directory, exist_ok=True)
+        # Columns first, ids last: a reader that sees the new ids sees the new strings too
+        StringColumn.save(directory, 'title', titles)
+        StringColumn.save(directory, 'tags', tags)
+        _atomic_write(os.path.join(directory, MOVIE_IDS_FILE),
+                      lambda f: np.save(f, np.asarray(movie_ids, dtype=np.int64)))
+
+
+def build(movies_path: str = MOVIES_FILE, out_dir: str = CATALOG_DIR) -> Catalog:
+    """Write the catalog from movies_dict.pkl (same row order as the neighbor index)."""
+    from build_similarity import load_movies
+    movie_ids, titles, tags = load_movies(movies_path)
+    Catalog.save(out_dir, movie_ids, titles, tags)
+    logger.info(f"Wrote {len(movie_ids)} movies to {out_dir}")
+    return Catalog.load(out_dir)
+
+
+# --- Cold-start measurement ---
+# Each snippet runs in a fresh interpreter, imports included, as a new worker would.
+LEGACY_LOAD = """
+import pickle as pkl, pandas as pd
+movies = pd.DataFrame(pkl.load(open({movies!r}, 'rb')))
+titles = movies['title'].values
+"""
+CATALOG_LOAD = """
+from catalog import Catalog
+catalog = Catalog.load({catalog!r})
+titles = catalog.titles
+"""
+
+
+def _time_snippet(snippet: str, repeat: int) -> float:
+    """Median wall time of running `snippet` in a fresh interpreter, minus bare startup."""
+    def run(code):
+        began = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        return time.perf_counter() - began
+    baseline = float(np.median([run('pass') for _ in range(repeat)]))
+    return float(np.median([run(snippet) for _ in range(repeat)])) - baseline
+
+
+def bench(movies_path: str = MOVIES_FILE, catalog_dir: str = CATALOG_DIR, repeat: int = 5) -> dict:
+    legacy = _time_snippet(LEGACY_LOAD.format(movies=os.path.abspath(movies_path)), repeat)
+    columnar = _time_snippet(CATALOG_LOAD.format(catalog=os.path.abspath(catalog_dir)), repeat)
+    return {'pickle_dataframe_s': legacy, 'catalog_s': columnar}
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--movies', default=MOVIES_FILE, help="catalog pickle (movie_id, title, tags)")
+    common.add_argument('--out', default=CATALOG_DIR, help="catalog directory")
+    parser = argparse.ArgumentParser(description="Build or benchmark the columnar movie catalog.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', parents=[common], help="write the catalog from the pickle")
+    bench_parser = commands.add_parser('bench', parents=[common], help="compare cold-start load times")
+    bench_parser.add_argument('--repeat', type=int, default=5, help="runs per variant (median is reported)")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.movies, args.out)
+    else:
+        if not os.path.exists(os.path.join(args.out, MOVIE_IDS_FILE)):
+            build(args.movies, args.out)
+        result = bench(args.movies, args.out, args.repeat)
+        logger.info(f"pickle + DataFrame: {result['pickle_dataframe_s'] * 1000:.0f} ms, "
+                    f"columnar catalog: {result['catalog_s'] * 1000:.0f} ms "
+                    f"({result['pickle_dataframe_s'] / max(result['catalog_s'], 1e-9):.1f}x faster)")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,133 @@
+import time
+import threading
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency the breaker considers down."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit open, next probe in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker over a rolling window of call outcomes.
+
+    Closed: calls go through. Once at least `min_calls` calls finished within
+    `window` seconds and `failure_rate` of them failed, it opens and every
+    call is rejected for `cooldown` seconds. Then it is half-open: one probe
+    call goes through; its success closes the breaker, its failure opens it
+    again. A probe that never reports back is replaced after `probe_timeout`.
+
+    `on_transition(old, new)` is called outside the lock on every state change.
+    """
+
+    def __init__(self, name: str, failure_rate: float = 0.5, min_calls: int = 10, window: float = 30,
+                 cooldown: float = 15, probe_timeout: float = 10,
+                 on_transition: Optional[Callable[[str, str], None]] = None):
+        if not 0 < failure_rate <= 1 or min_calls < 1:
+            raise ValueError("failure_rate must be in (0, 1] and min_calls >= 1")
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self.on_transition = on_transition
+        self._state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()  # (finished at, failed)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _prune(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] >= self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def _move(self, new: str, now: float) -> Tuple[str, str]:
+        old, self._state = self._state, new
+        if new == OPEN:
+            self._opened_at = now
+        self._probe_started = None
+        self._outcomes.clear()
+        self._failures = 0
+        return old, new
+
+    def _notify(self, transition: Optional[Tuple[str, str]]):
+        if transition is not None and self.on_transition is not None:
+            self.on_transition(*transition)
+
+    def allow(self) -> bool:
+        """May a call go through now? Every allowed call must end in record_success or record_failure."""
+        transition = None
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self.cooldown:
+                transition = self._move(HALF_OPEN, now)
+            if self._state == HALF_OPEN:
+                if self._probe_started is None or now - self._probe_started >= self.probe_timeout:
+                    self._probe_started = now
+                    allowed = True
+                else:
+                    allowed = False
+            else:
+                allowed = self._state == CLOSED
+            if not allowed:
+                self._rejected += 1
+        self._notify(transition)
+        return allowed
+
+    def retry_after(self) -> float:
+        """Seconds until a call may be allowed again; 0 unless open."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def record_success(self):
+        transition = None
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                transition = self._move(CLOSED, now)
+            elif self._state == CLOSED:
+                self._prune(now)
+                self._outcomes.append((now, False))
+        self._notify(transition)
+
+    def record_failure(self):
+        transition = None
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                transition = self._move(OPEN, now)
+            elif self._state == CLOSED:
+                self._prune(now)
+                self._outcomes.append((now, True))
+                self._failures += 1
+                calls = len(self._outcomes)
+                if calls >= self.min_calls and self._failures >= self.failure_rate * calls:
+                    transition = self._move(OPEN, now)
+        self._notify(transition)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                'open': int(self._state == OPEN),
+                'half_open': int(self._state == HALF_OPEN),
+                'window_calls': len(self._outcomes),
+                'window_failures': self._failures,
+                'rejected': self._rejected,
+            }
@@ -0,0 +1,222 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+import metrics
+
+# Storage backend for users and search history, shared by every Streamlit
+# session in the process. DB_BACKEND selects it:
+#   mysql  - pooled mysql.connector connections (production)
+#   sqlite - local file, no server needed (tests, benchmarks, dev)
+# Queries are written once with %s placeholders and translated per backend.
+
+logger = logging.getLogger(__name__)
+
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql")
+MYSQL_CONFIG = {
+    'host': os.getenv("DB_HOST", "localhost"),
+    'user': os.getenv("DB_USER", "root"),
+    'password': os.getenv("DB_PASSWORD", "1234"),
+    'database': os.getenv("DB_NAME", "movies_db"),
+}
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))  # mysql.connector caps pools at 32
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+HEALTH_CHECK_IDLE = 30  # ping connections that sat idle longer than this before handing them out
+SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "movies_db.db")
+
+
+class MySQLBackend:
+    """Bounded pool of MySQL connections.
+
+    Callers beyond the pool size wait up to POOL_TIMEOUT for a connection
+    instead of failing. Connections idle for a while are pinged (and
+    reconnected) before use, so a server-side timeout doesn't surface as a
+    failed query.
+    """
+    name = 'mysql'
+
+    def __init__(self, config: dict = MYSQL_CONFIG, pool_size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        from mysql.connector import errors, pooling
+        self.IntegrityError = errors.IntegrityError
+        self.timeout = timeout
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name="movies_db", pool_size=pool_size, pool_reset_session=True, **config)
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._last_used = {}
+
+    @contextmanager
+    def connection(self) -> Iterator:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No database connection free after {self.timeout}s")
+        try:
+            conn = self._pool.get_connection()
+            try:
+                key = conn.connection_id
+                if time.monotonic() - self._last_used.get(key, 0) > HEALTH_CHECK_IDLE:
+                    conn.ping(reconnect=True, attempts=2, delay=0.2)
+                    key = conn.connection_id
+                yield conn
+                self._last_used[key] = time.monotonic()
+            finally:
+                conn.close()  # returns it to the pool
+        finally:
+            self._slots.release()
+
+    def sql(self, query: str) -> str:
+        return query
+
+    def ddl(self, statement: str) -> str:
+        return statement
+
+    def upsert(self, table: str, columns: Tuple[str, ...], keys: Tuple[str, ...]) -> str:
+        """Single-statement insert; on a duplicate key it overwrites the other columns."""
+        updates = [f"{col} = VALUES({col})" for col in columns if col not in keys]
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE {', '.join(updates)}")
+
+    def has_index(self, conn, table: str, name: str) -> bool:
+        c = conn.cursor()
+        c.execute("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            LIMIT 1
+        """, (table, name))
+        return bool(c.fetchall())
+
+
+class SQLiteBackend:
+    """Local SQLite stand-in with the same interface; one connection per thread."""
+    name = 'sqlite'
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def sql(self, query: str) -> str:
+        return query.replace("%s", "?")
+
+    def ddl(self, statement: str) -> str:
+        return statement.replace("INT AUTO_INCREMENT PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+
+    def upsert(self, table: str, columns: Tuple[str, ...], keys: Tuple[str, ...]) -> str:
+        updates = [f"{col} = excluded.{col}" for col in columns if col not in keys]
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}")
+
+    def has_index(self, conn, table: str, name: str) -> bool:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name = ?", (table, name)).fetchone()
+        return row is not None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Process-wide backend, created on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if DB_BACKEND == 'sqlite':
+                    _backend = SQLiteBackend()
+                elif DB_BACKEND == 'mysql':
+                    _backend = MySQLBackend()
+                else:
+                    raise ValueError(f"Unknown DB_BACKEND {DB_BACKEND!r}")
+                logger.info(f"Using {_backend.name} database backend")
+    return _backend
+
+
+def set_backend(backend):
+    """Swap the backend, e.g. an SQLiteBackend on a temp file in benchmarks."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+# --- Metrics ---
+QUERY_SECONDS = metrics.histogram('db_query_seconds', "Query helpers, connection checkout included", ('statement',))
+CHECKOUT_SECONDS = metrics.histogram('db_connection_wait_seconds', "Waiting for a pooled connection")
+QUERY_ERRORS = metrics.counter('db_errors_total', "Query helpers that raised", ('statement', 'error'))
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def statement_label(query: str) -> str:
+    """'select search_history' for a query: low-cardinality, unlike the SQL text."""
+    verb = query.split(None, 1)[0].lower() if query.strip() else ''
+    table = _TABLE.search(query)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+@contextmanager
+def _query(query: str) -> Iterator:
+    """A pooled connection for one helper call, timed under the query's statement label."""
+    statement = statement_label(query)
+    began = time.perf_counter()
+    try:
+        backend = get_backend()
+        with backend.connection() as conn:
+            CHECKOUT_SECONDS.observe(time.perf_counter() - began)
+            yield backend, conn
+    except Exception as e:
+        QUERY_ERRORS.inc(statement=statement, error=type(e).__name__)
+        raise
+    finally:
+        QUERY_SECONDS.observe(time.perf_counter() - began, statement=statement)
+
+
+# --- Query helpers: one pooled connection per call ---
+def execute(query: str, params: tuple = ()) -> int:
+    with _query(query) as (backend, conn):
+        c = conn.cursor()
+        c.execute(backend.sql(query), params)
+        conn.commit()
+        return c.rowcount
+
+
+def executemany(query: str, rows: List[tuple]) -> None:
+    """Run `query` for every row in one transaction."""
+    with _query(query) as (backend, conn):
+        c = conn.cursor()
+        c.executemany(backend.sql(query), rows)
+        conn.commit()
+
+
+def fetchone(query: str, params: tuple = ()) -> Optional[tuple]:
+    with _query(query) as (backend, conn):
+        c = conn.cursor()
+        c.execute(backend.sql(query), params)
+        row = c.fetchone()
+        c.fetchall()  # mysql.connector refuses to reuse a connection with unread rows
+        return row
+
+
+def fetchall(query: str, params: tuple = ()) -> List[tuple]:
+    with _query(query) as (backend, conn):
+        c = conn.cursor()
+        c.execute(backend.sql(query), params)
+        return c.fetchall()
@@ -1,31 +1,35 @@
+import threading
+import datetime
+import time
+import hashlib
+
+import os
+
 import streamlit as st
-import mysql.connector
-import bcrypt
-
-# --- MySQL Connection Helper ---
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",        # your MySQL host
-        user="root",             # your MySQL username
-        password="1234", # your MySQL password
-        database="movies_db"     # your MySQL database
-    )
+import streamlit.components.v1 as components
 
-# --- Initialize Tables ---
-def init_db():
-    conn = get_connection()
-    c = conn.cursor()
+import db
+import passwords
+import session_token
+from rate_limiter import AttemptLimiter
+from write_queue import WriteQueue
+
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+LOGIN_LOCKOUT_WINDOW = float(os.getenv("LOGIN_LOCKOUT_WINDOW", "300"))  # seconds
+login_attempts = AttemptLimiter(LOGIN_MAX_FAILURES, LOGIN_LOCKOUT_WINDOW)
+SESSION_COOKIE = "movie_session"
 
-    # Create users table
-    c.execute("""
+# --- Initialize Tables ---
+SCHEMA = [
+    # Users table
+    """
         CREATE TABLE IF NOT EXISTS users (
             username VARCHAR(255) PRIMARY KEY,
             password VARCHAR(255) NOT NULL
         )
-    """)
-
-    # Create search history table
-    c.execute("""
+    """,
+    # Search history table
+    """
         CREATE TABLE IF NOT EXISTS search_history (
             id INT AUTO_INCREMENT PRIMARY KEY,
             username VARCHAR(255) NOT NULL,
@@ -33,36 +37,163 @@ def init_db():
             movie_title VARCHAR(255) NOT NULL,
             searched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    """)
+    """,
+    # Genre search history table
+    """
+        CREATE TABLE IF NOT EXISTS genre_search_history (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(255) NOT NULL,
+            genre_name VARCHAR(255) NOT NULL,
+            searched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    # Live session tokens, by SHA-256; logout deletes the row
+    """
+        CREATE TABLE IF NOT EXISTS sessions (
+            token_hash CHAR(64) PRIMARY KEY,
+            username VARCHAR(255) NOT NULL,
+            expires_at BIGINT NOT NULL
+        )
+    """,
+]
+
+# (table, index name, columns, unique). The unique keys make each history write a
+# single upsert; the (username, searched_at, ...) keys cover the recent-searches reads.
+INDEXES = [
+    ('search_history', 'uq_search_user_movie', ('username', 'movie_id'), True),
+    ('search_history', 'idx_search_user_time', ('username', 'searched_at', 'movie_id', 'movie_title'), False),
+    ('genre_search_history', 'uq_genre_user_genre', ('username', 'genre_name'), True),
+    ('genre_search_history', 'idx_genre_user_time', ('username', 'searched_at', 'genre_name'), False),
+]
 
-    conn.commit()
-    conn.close()
+# Duplicates to drop (keeping the latest inserted row) before adding a unique index to an existing table
+DEDUPE = {
+    'search_history': ('username', 'movie_id'),
+    'genre_search_history': ('username', 'genre_name'),
+}
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def init_db():
+    """Create the tables; runs once per process, later calls return immediately."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        backend = db.get_backend()
+        with backend.connection() as conn:
+            c = conn.cursor()
+            for statement in SCHEMA:
+                c.execute(backend.ddl(statement))
+            for table, name, columns, unique in INDEXES:
+                if backend.has_index(conn, table, name):
+                    continue
+                if unique:
+                    c.execute(f"""
+                        DELETE FROM {table} WHERE id NOT IN (
+                            SELECT id FROM (SELECT MAX(id) AS id FROM {table} GROUP BY {', '.join(DEDUPE[table])}) AS keep
+                        )
+                    """)
+                c.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})")
+            conn.commit()
+        _schema_ready = True
 
 # --- Add new user (Signup) ---
 def add_user(username, password):
-    conn = get_connection()
-    c = conn.cursor()
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    hashed = passwords.hash_password(password)
     try:
-        c.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed))
-        conn.commit()
+        db.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed))
         return True
-    except mysql.connector.IntegrityError:  # username already exists
+    except db.get_backend().IntegrityError:  # username already exists
         return False
-    finally:
-        conn.close()
 
 # --- Check user (Login) ---
 def check_user(username, password):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("SELECT password FROM users WHERE username = %s", (username,))
-    row = c.fetchone()
-    conn.close()
-    if row and bcrypt.checkpw(password.encode(), row[0].encode()):
+    """Verify a password; always False while the username is locked out."""
+    if login_attempts.retry_after(username):
+        return False
+    row = db.fetchone("SELECT password FROM users WHERE username = %s", (username,))
+    if row and passwords.verify_password(password, row[0]):
+        login_attempts.reset(username)
         return True
+    login_attempts.record_failure(username)
     return False
 
+# --- Session token (survives reconnects, skips bcrypt) ---
+# The token travels in a cookie, never in the URL, so it stays out of shared
+# links, history, access logs and Referer headers. A token is only honoured
+# while its row in `sessions` exists, so logout revokes it server-side.
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_session(username):
+    """Issue a token for `username` and record it as live."""
+    token = session_token.issue(username)
+    now = int(time.time())
+    db.execute("DELETE FROM sessions WHERE expires_at < %s", (now,))
+    db.execute("INSERT INTO sessions (token_hash, username, expires_at) VALUES (%s, %s, %s)",
+               (_token_hash(token), username, now + session_token.SESSION_TTL))
+    return token
+
+
+def session_user(token):
+    """Username of a valid token that hasn't been revoked; None otherwise."""
+    username = session_token.verify(token)
+    if username and db.fetchone("SELECT 1 FROM sessions WHERE token_hash = %s AND expires_at >= %s",
+                                (_token_hash(token), int(time.time()))):
+        return username
+    return None
+
+
+def revoke_session(token):
+    db.execute("DELETE FROM sessions WHERE token_hash = %s", (_token_hash(token),))
+
+
+def restore_session():
+    """Log the session in from a valid token cookie, if there is one."""
+    st.query_params.pop("session", None)  # tokens used to be put in the URL; don't leave one there
+    token = st.context.cookies.get(SESSION_COOKIE)
+    username = session_user(token)
+    if username:
+        st.session_state["authenticated"] = True
+        st.session_state["username"] = username
+        st.session_state["session_token"] = token
+    return username is not None
+
+
+def logout():
+    token = st.session_state.pop("session_token", None) or st.context.cookies.get(SESSION_COOKIE)
+    if token:
+        revoke_session(token)
+    st.session_state["authenticated"] = False
+    st.session_state["username"] = None
+    st.session_state["session_cookie"] = ("", 0)
+
+
+def sync_session_cookie():
+    """Write a pending token (or its removal) to the browser's cookie; call once per rerun.
+
+    Streamlit can't set response headers, so a zero-height component does it
+    from the page. It runs on the rerun after the change, because a login or
+    logout ends its own rerun with st.rerun().
+    """
+    pending = st.session_state.pop("session_cookie", None)
+    if pending is None:
+        return
+    token, max_age = pending
+    components.html(
+        f"""<script>
+        const secure = parent.location.protocol === 'https:' ? '; Secure' : '';
+        parent.document.cookie = '{SESSION_COOKIE}={token}; Max-Age={max_age}; Path=/; SameSite=Strict' + secure;
+        </script>""",
+        height=0,
+    )
+
 # --- Authentication UI ---
 def auth_ui():
     st.title("🔑 User Authentication")
@@ -73,107 +204,133 @@ def auth_ui():
 
     if choice == "Signup":
         if st.button("Sign Up"):
-            if add_user(username, password):
-                st.success("✅ Signup successful! Please login.")
+            try:
+                created = add_user(username, password)
+            except TimeoutError:
+                st.error("⏳ The server is busy. Please try again in a moment.")
             else:
-                st.error("⚠️ Username already exists!")
+                if created:
+                    st.success("✅ Signup successful! Please login.")
+                else:
+                    st.error("⚠️ Username already exists!")
 
     elif choice == "Login":
         if st.button("Login"):
-            if check_user(username, password):
-                st.session_state["authenticated"] = True
-                st.session_state["username"] = username
-                st.success("🎉 Login successful!")
-                st.rerun()
+            retry_after = login_attempts.retry_after(username)
+            try:
+                valid = not retry_after and check_user(username, password)
+            except TimeoutError:
+                st.error("⏳ The server is busy. Please try again in a moment.")
             else:
-                st.error("❌ Invalid username or password.")
+                if retry_after:
+                    st.error(f"⏳ Too many failed attempts. Try again in {int(retry_after // 60) + 1} min.")
+                elif valid:
+                    st.session_state["authenticated"] = True
+                    st.session_state["username"] = username
+                    token = create_session(username)
+                    st.session_state["session_token"] = token
+                    st.session_state["session_cookie"] = (token, session_token.SESSION_TTL)
+                    st.success("🎉 Login successful!")
+                    st.rerun()
+                else:
+                    st.error("❌ Invalid username or password.")
 
 # --- Save search history ---
-def add_search(username, movie_id, movie_title):
-    conn = get_connection()
-    c = conn.cursor()
+# Clicks only queue the write; a background thread upserts the queued rows in
+# batches, keeping the database off the render path. Repeated searches for the
+# same key collapse into one row while queued. Rows keep the time of the click
+# (local time, as shown from the queue), not the time of the flush.
+def _timestamp(searched_at):
+    return searched_at.strftime('%Y-%m-%d %H:%M:%S')  # CURRENT_TIMESTAMP's format, for both backends
 
-    # Check if this user already searched for this movie
-    c.execute(
-        "SELECT id FROM search_history WHERE username = %s AND movie_id = %s",
-        (username, movie_id)
-    )
-    row = c.fetchone()
 
-    if row:
-        # Update timestamp if it exists
-        c.execute(
-            "UPDATE search_history SET searched_at = CURRENT_TIMESTAMP WHERE id = %s",
-            (row[0],)
-        )
-    else:
-        # Insert new search record
-        c.execute(
-            "INSERT INTO search_history (username, movie_id, movie_title) VALUES (%s, %s, %s)",
-            (username, movie_id, movie_title)
-        )
+def _write_searches(rows):
+    backend = db.get_backend()
+    db.executemany(backend.upsert('search_history', ('username', 'movie_id', 'movie_title', 'searched_at'),
+                                  ('username', 'movie_id')),
+                   [(username, movie_id, movie_title, _timestamp(searched_at))
+                    for username, movie_id, movie_title, searched_at in rows])
 
-    conn.commit()
-    conn.close()
-
-
-# --- Fetch recent searches ---
-def get_recent_searches(username, limit=5):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("""
-        SELECT movie_title, searched_at, movie_id
-        FROM search_history
-        WHERE username = %s
-        ORDER BY searched_at DESC
-        LIMIT %s
-    """, (username, limit))
-    rows = c.fetchall()
-    conn.close()
-    return rows
 
-# --- Add a genre search ---
-def add_genre_search(username, genre_name):
-    conn = get_connection()
-    c = conn.cursor()
+def _write_genre_searches(rows):
+    backend = db.get_backend()
+    db.executemany(backend.upsert('genre_search_history', ('username', 'genre_name', 'searched_at'),
+                                  ('username', 'genre_name')),
+                   [(username, genre_name, _timestamp(searched_at)) for username, genre_name, searched_at in rows])
 
-    # Check if this user already searched for this genre
-    c.execute(
-        "SELECT id FROM genre_search_history WHERE username = %s AND genre_name = %s",
-        (username, genre_name)
-    )
-    row = c.fetchone()
 
-    if row:
-        # Update timestamp if it exists
-        c.execute(
-            "UPDATE genre_search_history SET searched_at = CURRENT_TIMESTAMP WHERE id = %s",
-            (row[0],)
-        )
-    else:
-        # Insert new search record
-        c.execute(
-            "INSERT INTO genre_search_history (username, genre_name) VALUES (%s, %s)",
-            (username, genre_name)
-        )
+search_writes = WriteQueue(_write_searches, name="search-history-writer")
+genre_search_writes = WriteQueue(_write_genre_searches, name="genre-history-writer")
 
-    conn.commit()
-    conn.close()
 
+def flush_history():
+    """Commit every queued history write now."""
+    search_writes.flush()
+    genre_search_writes.flush()
 
-# --- Fetch recent genre searches ---
-def get_recent_genre_searches(username, limit=5):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("""
-        SELECT genre_name, searched_at
-        FROM genre_search_history
-        WHERE username = %s
-        ORDER BY searched_at DESC
-        LIMIT %s
-    """, (username, limit))
-    rows = c.fetchall()
-    conn.close()
-    return rows
+
+def _with_pending(rows, pending, limit, key):
+    """Put rows still in the write queue (newest first) ahead of the stored ones."""
+    if not pending:
+        return rows
+    queued_keys = {row[key] for row in pending}
+    merged = pending[::-1] + [row for row in rows if row[key] not in queued_keys]
+    return merged[:limit]
+
+
+# Bumped whenever a user records a search, so cached history views know to reload
+_history_versions = {}
+_history_versions_lock = threading.Lock()
+
+
+def _bump_history_version(username):
+    with _history_versions_lock:
+        _history_versions[username] = _history_versions.get(username, 0) + 1
+
+
+def history_version(username):
+    with _history_versions_lock:
+        return _history_versions.get(username, 0)
+
+
+def add_search(username, movie_id, movie_title):
+    searched_at = datetime.datetime.now().replace(microsecond=0)
+    search_writes.put((username, movie_id), (username, movie_id, movie_title, searched_at))
+    _bump_history_version(username)
+
+
+# --- Add a genre search ---
+def add_genre_search(username, genre_name):
+    searched_at = datetime.datetime.now().replace(microsecond=0)
+    genre_search_writes.put((username, genre_name), (username, genre_name, searched_at))
+    _bump_history_version(username)
 
 
+# --- Fetch both recent-history panels in one round trip ---
+def get_recent_history(username, limit=5):
+    """(recent_searches, recent_genre_searches): newest first, queued writes included."""
+    pending_movies = [(movie_title, searched_at, movie_id)
+                      for user, movie_id, movie_title, searched_at in search_writes.pending() if user == username]
+    pending_genres = [(genre_name, searched_at)
+                      for user, genre_name, searched_at in genre_search_writes.pending() if user == username]
+    rows = db.fetchall("""
+        SELECT * FROM (
+            SELECT 'movie' AS kind, movie_title AS name, searched_at, movie_id
+            FROM search_history
+            WHERE username = %s
+            ORDER BY searched_at DESC
+            LIMIT %s
+        ) AS recent_movies
+        UNION ALL
+        SELECT * FROM (
+            SELECT 'genre' AS kind, genre_name AS name, searched_at, NULL AS movie_id
+            FROM genre_search_history
+            WHERE username = %s
+            ORDER BY searched_at DESC
+            LIMIT %s
+        ) AS recent_genres
+    """, (username, limit, username, limit))
+    movies = [(name, searched_at, movie_id) for kind, name, searched_at, movie_id in rows if kind == 'movie']
+    genres = [(name, searched_at) for kind, name, searched_at, _ in rows if kind == 'genre']
+    return (_with_pending(movies, pending_movies, limit, key=2),
+            _with_pending(genres, pending_genres, limit, key=0))
@@ -0,0 +1,113 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from poster_store import PosterStore
+from single_flight import SingleFlight
+
+DISCOVER_TTL = float(os.getenv("TMDB_TTL_DISCOVER", str(6 * 3600)))
+MEMORY_ENTRIES = 256
+
+# Query parameters that never change the response
+_IGNORED_PARAMS = {'api_key'}
+# Comma-separated id lists whose order doesn't matter
+_LIST_PARAMS = {'with_genres', 'without_genres'}
+
+
+def normalize_params(params: dict) -> str:
+    """Cache key for a /discover/movie query: sorted, stringified, api_key dropped."""
+    parts = []
+    for name in sorted(params):
+        if name in _IGNORED_PARAMS or params[name] is None:
+            continue
+        value = str(params[name]).strip()
+        if name in _LIST_PARAMS:
+            value = ",".join(sorted(v.strip() for v in value.split(",") if v.strip()))
+        parts.append(f"{name}={value}")
+    return "&".join(parts)
+
+
+class DiscoverCache:
+    """Cross-session cache of /discover/movie responses with TTL and request coalescing.
+
+    Responses live in a small in-memory map backed by a PosterStore table,
+    so every session and worker on the host shares them. Concurrent misses
+    for the same query wait on a single upstream call. If that call fails,
+    an expired response for the query is served instead, when there is one.
+    """
+
+    def __init__(self, store: PosterStore, ttl: float = DISCOVER_TTL, memory_entries: int = MEMORY_ENTRIES):
+        self.store = store
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.counters = {'hits': 0, 'misses': 0, 'coalesced': 0, 'upstream_calls': 0, 'stale_served': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, size=len(self._memory))
+
+    def _lookup(self, key: str, allow_stale: bool = False) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            stored = self.store.get(key)
+            if stored is None:
+                return None
+            entry = (stored['data'], stored['fetched_at'])
+            self._remember(key, *entry)
+        data, fetched_at = entry
+        return data if allow_stale or now - fetched_at < self.ttl else None
+
+    def _remember(self, key: str, data: dict, fetched_at: float):
+        with self._lock:
+            self._memory[key] = (data, fetched_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_or_fetch(self, params: dict, fetch: Callable[[], dict]) -> dict:
+        key = normalize_params(params)
+        data = self._lookup(key)
+        if data is not None:
+            self._count('hits')
+            return data
+
+        self._count('misses')
+        leader = []
+
+        def load():
+            leader.append(True)
+            # A flight that just finished may already have stored it
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+            self._count('upstream_calls')
+            try:
+                fresh = fetch()
+            except Exception:
+                stale = self._lookup(key, allow_stale=True)
+                if stale is None:
+                    raise
+                self._count('stale_served')
+                return stale
+            now = time.time()
+            self._remember(key, fresh, now)
+            self.store.put(key, {'data': fresh, 'fetched_at': now})
+            return fresh
+
+        data = self._flight.do(key, load)
+        if not leader:
+            self._count('coalesced')
+        return data
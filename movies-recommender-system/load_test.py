@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import logging
+import tempfile
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+import mock_tmdb
+
+# Drives N simulated users through one process's worth of shared state: the
+# tmdb client and its caches, the db_auth write queues and the served
+# artifacts. Each user logs in, then keeps picking a flow (title
+# recommendations, top movies of a year, genre recommendations) with think
+# time in between, doing the same calls app.py makes for that click.
+# Streamlit's own rendering and websocket traffic are not included.
+#
+#   python load_test.py --users 50 --duration 60 --latency 80 --jitter 40 --error-rate 0.02
+#   python load_test.py --users 50 --tmdb-url http://127.0.0.1:8765/3   # an already running mock_tmdb.py
+#
+# By default a mock TMDB server runs in this process and the database is a
+# scratch SQLite file; --db-from-env uses DB_BACKEND and friends instead. For
+# the cleanest numbers run mock_tmdb.py as its own process, so it doesn't
+# compete with the simulated users for the GIL.
+
+logger = logging.getLogger(__name__)
+
+FLOW_WEIGHTS = {'title': 0.5, 'year': 0.25, 'genre': 0.25}
+PASSWORD = "load-test-password"
+OK, DEGRADED, ERROR = 'ok', 'degraded', 'error'  # degraded: a card fell back to the placeholder
+
+
+class Sample(NamedTuple):
+    flow: str
+    started: float
+    seconds: float
+    outcome: str
+
+
+class App:
+    """The calls app.py makes for each click, against the modules it imports."""
+
+    def __init__(self, served, genres: Dict[str, int]):
+        import tmdb
+        import db_auth
+        import recommender
+        self.tmdb = tmdb
+        self.db_auth = db_auth
+        self.recommender = recommender
+        self.catalog = served.catalog
+        self.neighbors = served.neighbors
+        self.title_index = served.title_index
+        self.genres = genres
+        self.genre_names = {genre_id: name for name, genre_id in genres.items()}
+
+    def _outcome(self, movie_data: list) -> str:
+        return DEGRADED if any(data is self.tmdb.FALLBACK_MOVIE_DATA for data in movie_data) else OK
+
+    def login(self, username: str) -> str:
+        if not self.db_auth.check_user(username, PASSWORD):
+            return ERROR
+        self.db_auth.create_session(username)
+        return OK
+
+    def history(self, username: str) -> str:
+        """Reload both recent-history panels, as the page does after a new search."""
+        searches, genre_searches = self.db_auth.get_recent_history(username, limit=5)
+        movie_data = self.tmdb.fetch_movie_data_many([movie_id for _, _, movie_id in searches], need_volatile=False)
+        posters = self.tmdb.discover_many([{'language': 'en-US', 'sort_by': 'popularity.desc',
+                                            'with_genres': self.genres[genre_name], 'page': 1}
+                                           for genre_name, _ in genre_searches if genre_name in self.genres])
+        if any(data is None for data in posters):
+            return DEGRADED
+        return self._outcome(movie_data)
+
+    def title(self, username: str, title: str) -> str:
+        rows = self.recommender.recommend_many(self.title_index, self.neighbors, [title], 5)[0]
+        if not rows:
+            return ERROR
+        movie_data = self.tmdb.fetch_movie_data_many([int(self.catalog.movie_ids[row]) for row in rows])
+        row = self.title_index.lookup(title)
+        if row is not None:
+            self.db_auth.add_search(username, int(self.catalog.movie_ids[row]), title)
+        return self._outcome(movie_data)
+
+    def year(self, year: int) -> str:
+        data = self.tmdb.discover({'language': 'en-US', 'sort_by': 'popularity.desc',
+                                   'primary_release_year': year, 'page': 1})
+        return self._cards(data)
+
+    def genre(self, username: str, genre_names: List[str]) -> str:
+        for genre_name in genre_names:
+            self.db_auth.add_genre_search(username, genre_name)
+        data = self.tmdb.discover({'language': 'en-US', 'sort_by': 'popularity.desc',
+                                   'with_genres': ",".join(str(self.genres[g]) for g in genre_names), 'page': 1})
+        return self._cards(data)
+
+    def _cards(self, data: dict) -> str:
+        """Grid cards from a discover response; app.py fetches details only on "See details"."""
+        for movie in data.get('results', [])[:5]:
+            self.tmdb.card_from_discover(movie, self.genre_names)
+        return OK
+
+
+def fetch_genres() -> Dict[str, int]:
+    """Same request as app.fetch_genres (cached there for a day, so once per run here)."""
+    import tmdb
+    res = tmdb.get(f"{tmdb.BASE_URL}/genre/movie/list", {'api_key': tmdb.API_KEY, 'language': 'en-US'})
+    res.raise_for_status()
+    return {g['name']: g['id'] for g in res.json().get('genres', [])}
+
+
+# --- Simulated users ---
+def run_user(app: App, user: int, deadline: float, think: float, seed: int, samples: List[Sample]):
+    rng = np.random.default_rng(seed + user)
+    username = f"load-{user}"
+    flows = list(FLOW_WEIGHTS)
+    weights = np.array([FLOW_WEIGHTS[flow] for flow in flows])
+    weights /= weights.sum()
+
+    def step(flow, fn, *args):
+        started = time.perf_counter()
+        try:
+            outcome = fn(*args)
+        except Exception as e:
+            logger.debug(f"{username} {flow}: {e}")
+            outcome = ERROR
+        samples.append(Sample(flow, started, time.perf_counter() - started, outcome))
+        return outcome
+
+    if step('login', app.login, username) == ERROR:
+        return
+    step('history', app.history, username)
+    while time.perf_counter() < deadline:
+        time.sleep(rng.exponential(think) if think else 0)
+        flow = flows[rng.choice(len(flows), p=weights)]
+        if flow == 'title':
+            step(flow, app.title, username, app.catalog.titles[int(rng.integers(len(app.catalog)))])
+            step('history', app.history, username)
+        elif flow == 'year':
+            step(flow, app.year, int(rng.integers(1980, 2017)))
+        else:
+            names = list(rng.choice(list(app.genres), int(rng.integers(1, 3)), replace=False))
+            step(flow, app.genre, username, names)
+            step('history', app.history, username)
+
+
+def run(app: App, users: int, duration: float, ramp_up: float, think: float, seed: int) -> List[Sample]:
+    per_user: List[List[Sample]] = [[] for _ in range(users)]
+    began = time.perf_counter()
+    deadline = began + ramp_up + duration
+    threads = []
+    for user in range(users):
+        thread = threading.Thread(target=run_user, name=f"user-{user}",
+                                  args=(app, user, deadline, think, seed, per_user[user]), daemon=True)
+        threads.append(thread)
+        thread.start()
+        if ramp_up:
+            time.sleep(ramp_up / users)
+    for thread in threads:
+        thread.join()
+    return sorted((sample for samples in per_user for sample in samples), key=lambda s: s.started)
+
+
+# --- Report ---
+def summarize(samples: List[Sample], elapsed: float) -> dict:
+    flows = {}
+    for flow in ['login', 'history'] + list(FLOW_WEIGHTS):
+        selected = [s for s in samples if s.flow == flow]
+        if not selected:
+            continue
+        latencies = np.array([s.seconds for s in selected]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        outcomes = [s.outcome for s in selected]
+        flows[flow] = {
+            'count': len(selected),
+            'per_s': len(selected) / elapsed,
+            'degraded_rate': outcomes.count(DEGRADED) / len(selected),
+            'error_rate': outcomes.count(ERROR) / len(selected),
+            'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'max_ms': float(latencies.max()),
+        }
+    clicks = [s for s in samples if s.flow in FLOW_WEIGHTS]
+    return {
+        'elapsed_s': elapsed,
+        'clicks_per_s': len(clicks) / elapsed,
+        'error_rate': sum(s.outcome == ERROR for s in clicks) / max(1, len(clicks)),
+        'flows': flows,
+    }
+
+
+def print_report(summary: dict, users: int, server: Optional[mock_tmdb.MockTMDBServer]):
+    print(f"{users} users, {summary['elapsed_s']:.0f}s: {summary['clicks_per_s']:.1f} clicks/s, "
+          f"{summary['error_rate']:.1%} errors")
+    print(f"{'flow':<8} {'count':>7} {'per s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'degraded':>9} {'errors':>7}")
+    for flow, r in summary['flows'].items():
+        print(f"{flow:<8} {r['count']:>7} {r['per_s']:>7.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['max_ms']:>8.1f} {r['degraded_rate']:>9.1%} {r['error_rate']:>7.1%}")
+    import tmdb
+    for name, cache in (('metadata', tmdb.metadata_cache), ('discover', tmdb.discover_cache)):
+        print(f"{name} cache: {', '.join(f'{key} {value}' for key, value in cache.stats().items())}")
+    if server is not None:
+        print(f"mock TMDB: {server.tmdb.requests} requests, {server.tmdb.errors} injected errors")
+
+
+def main():
+    import artifacts
+
+    parser = argparse.ArgumentParser(description="Simulate concurrent users against one process's shared state.")
+    parser.add_argument('--users', type=int, default=20, help="concurrent simulated sessions")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to run after ramp-up")
+    parser.add_argument('--ramp-up', type=float, default=5, help="seconds over which users join")
+    parser.add_argument('--think', type=float, default=1000, help="mean think time between clicks, in milliseconds")
+    parser.add_argument('--tmdb-url', help="TMDB base URL to use instead of starting a mock in this process")
+    parser.add_argument('--db-from-env', action='store_true',
+                        help="use the configured database (DB_BACKEND, ...) instead of a scratch SQLite file")
+    parser.add_argument('--root', default=artifacts.ARTIFACTS_ROOT, help="published artifacts directory")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help="also write the summary as JSON")
+    mock_tmdb.add_arguments(parser)
+    args = parser.parse_args()
+    artifacts_root = os.path.abspath(args.root)
+    version = artifacts.current_version(artifacts_root)
+    if version is None:
+        parser.error(f"nothing published in {artifacts_root}; run `python artifacts.py publish` first")
+
+    server = None
+    if args.tmdb_url is None:
+        server = mock_tmdb.start(mock_tmdb.from_arguments(args))
+        logger.info(f"Mock TMDB at {server.base_url}")
+    # Read by tmdb.py and db.py at import, so set before anything imports them
+    os.environ['TMDB_BASE_URL'] = args.tmdb_url or server.base_url
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    # tmdb.py keeps its caches in the working directory; start cold in a scratch one
+    workdir = tempfile.mkdtemp(prefix='movie-load-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        if not args.db_from_env:
+            os.environ['DB_BACKEND'] = 'sqlite'
+            os.environ['DB_SQLITE_PATH'] = os.path.join(workdir, 'movies_db.db')
+        import db_auth
+        db_auth.init_db()
+        served = artifacts.load(version, artifacts_root)
+        app = App(served, fetch_genres())
+
+        logger.info(f"Signing up {args.users} users")
+        for user in range(args.users):
+            db_auth.add_user(f"load-{user}", PASSWORD)  # False if it already exists
+
+        logger.info(f"Running {args.users} users for {args.ramp_up + args.duration:.0f}s")
+        began = time.perf_counter()
+        samples = run(app, args.users, args.duration, args.ramp_up, args.think / 1000, args.seed)
+        summary = summarize(samples, time.perf_counter() - began)
+        db_auth.flush_history()
+        print_report(summary, args.users, server)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
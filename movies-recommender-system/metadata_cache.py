@@ -0,0 +1,129 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from poster_store import PosterStore
+
+# Field classes of the 7-tuple (poster_url, year, overview, genres, release_date, runtime, vote_avg).
+# Static fields practically never change; the rating drifts as votes come in.
+STATIC_FIELDS = ('poster_url', 'year', 'overview', 'genres', 'release_date', 'runtime')
+VOLATILE_FIELDS = ('vote_avg',)
+FIELD_COUNT = len(STATIC_FIELDS) + len(VOLATILE_FIELDS)
+
+STATIC_TTL = float(os.getenv("TMDB_TTL_STATIC", str(30 * 24 * 3600)))
+VOLATILE_TTL = float(os.getenv("TMDB_TTL_VOLATILE", str(24 * 3600)))
+NEGATIVE_TTL = float(os.getenv("TMDB_TTL_NEGATIVE", "600"))
+LRU_SIZE = int(os.getenv("TMDB_LRU_SIZE", "2048"))
+
+# Lookup outcomes
+HIT = 'hit'            # fresh for the requested fields
+STALE = 'stale'        # present but expired; usable if a refresh fails
+NEGATIVE = 'negative'  # recently failed id, don't call TMDB again yet
+MISS = 'miss'
+
+_NEGATIVE_ENTRY = object()
+
+
+class MetadataCache:
+    """Bounded in-memory LRU in front of the PosterStore, with per-field-class TTLs.
+
+    Entries are stored as {"data": [...], "fetched_at": epoch}. Rows imported
+    from the legacy JSON cache carry no timestamp: their static fields are
+    trusted, their rating is treated as expired; the oldest of them hold only
+    4 fields and count as misses. Failed ids get short-lived negative entries
+    that live in memory only.
+    """
+
+    def __init__(self, store: PosterStore, lru_size: int = LRU_SIZE, static_ttl: float = STATIC_TTL,
+                 volatile_ttl: float = VOLATILE_TTL, negative_ttl: float = NEGATIVE_TTL):
+        self.store = store
+        self.lru_size = lru_size
+        self.static_ttl = static_ttl
+        self.volatile_ttl = volatile_ttl
+        self.negative_ttl = negative_ttl
+        self._lru: "OrderedDict[str, Tuple[object, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'stale': 0, 'misses': 0, 'negative_hits': 0,
+                         'memory_hits': 0, 'store_reads': 0, 'evictions': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, size=len(self._lru))
+
+    # --- LRU front ---
+    def _remember(self, key: str, value, stamp: Optional[float]):
+        with self._lock:
+            self._lru[key] = (value, stamp)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def _recall(self, key: str):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+                self.counters['memory_hits'] += 1
+            return entry
+
+    # --- Public API ---
+    def get(self, movie_id, need_volatile: bool = True) -> Tuple[Optional[tuple], str]:
+        """Return (data, outcome); data is set for HIT and STALE."""
+        key = str(movie_id)
+        now = time.time()
+        entry = self._recall(key)
+        if entry is not None and entry[0] is _NEGATIVE_ENTRY:
+            if now < entry[1]:
+                self._count('negative_hits')
+                return None, NEGATIVE
+            entry = None
+        if entry is None or not self._is_fresh(entry[1], now, need_volatile):
+            # Not in memory, or expired here: another worker may have refreshed the store
+            entry = self._load(key) or entry
+        if entry is None:
+            self._count('misses')
+            return None, MISS
+
+        value, stamp = entry
+        if self._is_fresh(stamp, now, need_volatile):
+            self._count('hits')
+            return value, HIT
+        self._count('stale')
+        return value, STALE
+
+    def _load(self, key: str):
+        self._count('store_reads')
+        stored = self.store.get(key)
+        if stored is None:
+            return None
+        if isinstance(stored, dict):
+            entry = (tuple(stored['data']), stored.get('fetched_at'))
+        else:
+            entry = (tuple(stored), None)  # legacy row without a timestamp
+        if len(entry[0]) != FIELD_COUNT:
+            return None  # legacy 4-field row: no release date, runtime or rating
+        self._remember(key, *entry)
+        return entry
+
+    def _is_fresh(self, fetched_at: Optional[float], now: float, need_volatile: bool) -> bool:
+        if fetched_at is None:
+            return not need_volatile
+        age = now - fetched_at
+        if age >= self.static_ttl:
+            return False
+        return not need_volatile or age < self.volatile_ttl
+
+    def put(self, movie_id, data: tuple):
+        now = time.time()
+        self._remember(str(movie_id), tuple(data), now)
+        self.store.put(movie_id, {'data': list(data), 'fetched_at': now})
+
+    def put_negative(self, movie_id):
+        self._remember(str(movie_id), _NEGATIVE_ENTRY, time.time() + self.negative_ttl)
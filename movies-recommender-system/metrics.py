@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Process-wide counters and latency histograms, cheap enough to leave on:
+# recording is a dict lookup and a few additions under a per-metric lock.
+# Nothing is exported unless configured:
+#
+#   METRICS_PORT=9105           Prometheus text format at http://<host>:9105/metrics
+#   METRICS_LOG_INTERVAL=60     a JSON snapshot on the "metrics" logger every 60s
+#
+# Metrics are created once at import of the module that owns them; creating
+# one again with the same name returns the existing one, so app.py can
+# declare its own on every rerun.
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0: no endpoint
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "0"))  # seconds; 0: no JSON logs
+# Seconds; fine enough to tell a cache hit from a network call, coarse enough to stay cheap
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+
+class Counter(_Metric):
+    """Monotonic count per label combination."""
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        return [(f"{self.name}{_format_labels(self.labels, key)}", value) for key, value in values]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {','.join(key) or 'total': value for key, value in self._values.items()}
+
+
+class Histogram(_Metric):
+    """Latency distribution per label combination, in cumulative buckets."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, list] = {}  # [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, **labels):
+        self._observe(self._key(labels), value)
+
+    def _observe(self, key: LabelValues, value: float):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def time(self, **labels) -> "_Timer":
+        """`with histogram.time(**labels):` observes the block's wall time."""
+        return _Timer(self, self._key(labels))
+
+    def _copy(self) -> Dict[LabelValues, list]:
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def samples(self) -> List[Tuple[str, float]]:
+        lines = []
+        for key, series in self._copy().items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                lines.append((f"{self.name}_bucket{_format_labels(self.labels, key, le)}", cumulative))
+            lines.append((f"{self.name}_sum{_format_labels(self.labels, key)}", series[-1]))
+            lines.append((f"{self.name}_count{_format_labels(self.labels, key)}", cumulative))
+        return lines
+
+    def snapshot(self) -> dict:
+        result = {}
+        for key, series in self._copy().items():
+            count = sum(series[:-1])
+            result[','.join(key) or 'total'] = {
+                'count': count,
+                'sum_s': round(series[-1], 6),
+                'p50_le_s': self._quantile_bound(series, count, 0.5),
+                'p99_le_s': self._quantile_bound(series, count, 0.99),
+            }
+        return result
+
+    def _quantile_bound(self, series: list, count: int, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None past the last bucket)."""
+        seen = 0
+        for bound, n in zip(self.buckets, series):
+            seen += n
+            if seen >= q * count:
+                return bound
+        return None
+
+
+class _Timer:
+    # A class rather than @contextmanager: about a third of the cost per span
+    __slots__ = ('histogram', 'key', 'began')
+
+    def __init__(self, histogram: Histogram, key: LabelValues):
+        self.histogram = histogram
+        self.key = key
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram._observe(self.key, time.perf_counter() - self.began)
+        return False
+
+
+class Collector:
+    """Values read from a callback at export time, e.g. a cache's own stats() counters."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, description: str, read: Callable[[], Dict[str, float]], label: str = 'key'):
+        self.name = name
+        self.description = description
+        self.read = read
+        self.label = label
+
+    def samples(self) -> List[Tuple[str, float]]:
+        return [(f"{self.name}{_format_labels((self.label,), (key,))}", value)
+                for key, value in self.read().items() if isinstance(value, (int, float))]
+
+    def snapshot(self) -> dict:
+        return dict(self.read())
+
+
+# --- Registry ---
+_metrics: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        return _metrics.setdefault(metric.name, metric)
+
+
+def counter(name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, description, labels))
+
+
+def histogram(name: str, description: str, labels: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, description, labels, buckets))
+
+
+def register_collector(name: str, description: str, read: Callable[[], Dict[str, float]],
+                       label: str = 'key') -> Collector:
+    """Export `read()` under `name`; a later registration under the same name replaces it."""
+    collector = Collector(name, description, read, label)
+    with _registry_lock:
+        _metrics[name] = collector
+    return collector
+
+
+STAGE_SECONDS = histogram('stage_seconds', "Time spent in each request stage", ('stage',))
+
+
+def span(stage: str) -> _Timer:
+    """`with metrics.span('neighbor_search'):` records the block's wall time under `stage`."""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+# --- Export ---
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_metrics.values())
+    lines = []
+    for metric in metrics:
+        try:
+            samples = metric.samples()
+        except Exception as e:
+            logger.error(f"Could not read metric {metric.name}: {e}")
+            continue
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{name} {value}" for name, value in samples)
+    return '\n'.join(lines) + '\n'
+
+
+def snapshot() -> dict:
+    with _registry_lock:
+        metrics = list(_metrics.values())
+    return {metric.name: metric.snapshot() for metric in metrics}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _log_forever(interval: float):
+    while True:
+        time.sleep(interval)
+        logger.info(json.dumps({'metrics': snapshot(), 'at': time.time()}))
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def start(port: int = METRICS_PORT, log_interval: float = METRICS_LOG_INTERVAL):
+    """Start the configured exporters; only the first call in a process does anything."""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    if port:
+        try:
+            server = ThreadingHTTPServer(('0.0.0.0', port), _Handler)
+        except OSError as e:
+            # Another worker on this host got the port first
+            logger.warning(f"Metrics endpoint not started on port {port}: {e}")
+        else:
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"Serving metrics on :{port}/metrics")
+    if log_interval:
+        threading.Thread(target=_log_forever, args=(log_interval,), name="metrics-log", daemon=True).start()
@@ -0,0 +1,291 @@
+import re
+import json
+import time
+import zlib
+import struct
+import random
+import argparse
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the TMDB API, for load tests and offline development.
+# Serves /movie/{id}, /discover/movie and /genre/movie/list from
+# poster_cache.json (titles and popularity order from movies_dict.pkl), with
+# injected latency and errors. /t/p/<size>/<file> stands in for the image
+# CDN with a flat-colored PNG of the requested width. Point the app at it with
+# TMDB_BASE_URL (and TMDB_IMAGE_URL for poster_proxy.py):
+#
+#   python mock_tmdb.py --port 8765 --latency 80 --jitter 40 --error-rate 0.02
+#   TMDB_BASE_URL=http://127.0.0.1:8765/3 TMDB_IMAGE_URL=http://127.0.0.1:8765/t/p streamlit run app.py
+#
+# Ids missing from poster_cache.json get a generated entry, so every catalog
+# movie resolves. Only cached movies show up in /discover/movie.
+
+logger = logging.getLogger(__name__)
+
+POSTER_CACHE_FILE = 'poster_cache.json'
+MOVIES_FILE = 'movies_dict.pkl'
+IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
+PAGE_SIZE = 20
+ERROR_STATUSES = (500, 503, 429)
+
+# TMDB's movie genre list (ids are stable)
+GENRES = {
+    28: 'Action', 12: 'Adventure', 16: 'Animation', 35: 'Comedy', 80: 'Crime', 99: 'Documentary',
+    18: 'Drama', 10751: 'Family', 14: 'Fantasy', 36: 'History', 27: 'Horror', 10402: 'Music',
+    9648: 'Mystery', 10749: 'Romance', 878: 'Science Fiction', 10770: 'TV Movie', 53: 'Thriller',
+    10752: 'War', 37: 'Western',
+}
+GENRE_IDS = {name: genre_id for genre_id, name in GENRES.items()}
+
+_MOVIE_PATH = re.compile(r"^/movie/(\d+)$")
+_IMAGE_PATH = re.compile(r"^/t/p/w(\d+)/([A-Za-z0-9_\-]+\.\w+)$")
+
+
+def placeholder_png(width: int, height: int, name: str) -> bytes:
+    """A flat-colored RGB PNG, its color derived from `name` so different posters differ."""
+    color = bytes(zlib.crc32(name.encode()).to_bytes(4, 'big')[:3])
+    raw = (b'\x00' + color * width) * height  # filter byte + pixels, per row
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+class MockTMDB:
+    """The movie data behind the server, plus its latency and error settings."""
+
+    def __init__(self, movies: Dict[int, dict], latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_statuses: Sequence[int] = ERROR_STATUSES, seed: Optional[int] = None):
+        self.movies = movies
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        # Most popular first, as sort_by=popularity.desc returns them
+        self._by_popularity = sorted(movies.values(), key=lambda m: -m['popularity'])
+
+    @classmethod
+    def from_files(cls, poster_cache: str = POSTER_CACHE_FILE, movies_path: Optional[str] = MOVIES_FILE,
+                   **kwargs) -> "MockTMDB":
+        with open(poster_cache) as f:
+            cached = json.load(f)
+        titles, ranks = {}, {}
+        if movies_path:
+            from build_similarity import load_movies
+            movie_ids, movie_titles, _ = load_movies(movies_path)
+            titles = dict(zip(movie_ids, movie_titles))
+            ranks = {movie_id: rank for rank, movie_id in enumerate(movie_ids)}
+
+        movies = {}
+        for key, entry in cached.items():
+            movie_id = int(key)
+            poster_url, year, overview, genres = entry[:4]
+            if len(entry) >= 7:
+                release_date, runtime, vote_avg = entry[4:7]
+            else:
+                # Older 4-field entries only have the year
+                release_date, runtime, vote_avg = f"{year}-01-01" if year.isdigit() else 'N/A', 0, 0.0
+            poster_path = poster_url[len(IMAGE_BASE_URL):] if poster_url.startswith(IMAGE_BASE_URL) else None
+            movies[movie_id] = {
+                'id': movie_id,
+                'title': titles.get(movie_id, f"Movie {movie_id}"),
+                'poster_path': poster_path,
+                'release_date': release_date if release_date != 'N/A' else '',
+                'overview': overview,
+                'genres': [{'id': GENRE_IDS[name], 'name': name} for name in genres if name in GENRE_IDS],
+                'runtime': runtime,
+                'vote_average': vote_avg,
+                # The catalog lists the biggest releases first; unknown ids sink to the bottom
+                'popularity': float(len(ranks) - ranks.get(movie_id, len(ranks))),
+            }
+        return cls(movies, **kwargs)
+
+    # --- Fault injection ---
+    def delay(self) -> float:
+        with self._lock:
+            return self.latency + (self._random.expovariate(1 / self.jitter) if self.jitter else 0.0)
+
+    def injected_error(self) -> Optional[int]:
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return self._random.choice(self.error_statuses)
+        return None
+
+    # --- Endpoints ---
+    def movie(self, movie_id: int) -> dict:
+        movie = self.movies.get(movie_id)
+        if movie is None:
+            movie = {
+                'id': movie_id, 'title': f"Movie {movie_id}", 'poster_path': f"/{movie_id}.jpg",
+                'release_date': '2000-01-01', 'overview': '', 'genres': [], 'runtime': 0,
+                'vote_average': 0.0, 'popularity': 0.0,
+            }
+        return movie
+
+    def discover(self, params: Dict[str, str]) -> dict:
+        matches = self._by_popularity
+        year = params.get('primary_release_year')
+        if year:
+            matches = [m for m in matches if m['release_date'].startswith(f"{year}-")]
+        with_genres = params.get('with_genres')
+        if with_genres:
+            # A comma means AND, a pipe OR, as in TMDB
+            wanted = [set(int(g) for g in part.split('|')) for part in with_genres.split(',') if part]
+            matches = [m for m in matches
+                       if all({g['id'] for g in m['genres']} & any_of for any_of in wanted)]
+        if params.get('sort_by', 'popularity.desc') == 'vote_average.desc':
+            matches = sorted(matches, key=lambda m: -m['vote_average'])
+
+        page = max(1, int(params.get('page', 1)))
+        results = [{
+            'id': m['id'], 'title': m['title'], 'poster_path': m['poster_path'],
+            'release_date': m['release_date'], 'overview': m['overview'],
+            'genre_ids': [g['id'] for g in m['genres']], 'vote_average': m['vote_average'],
+            'popularity': m['popularity'],
+        } for m in matches[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]]
+        return {'page': page, 'results': results, 'total_results': len(matches),
+                'total_pages': (len(matches) + PAGE_SIZE - 1) // PAGE_SIZE}
+
+    def genres(self) -> dict:
+        return {'genres': [{'id': genre_id, 'name': name} for genre_id, name in GENRES.items()]}
+
+    def image(self, path: str) -> Optional[bytes]:
+        match = _IMAGE_PATH.match(path)
+        if not match:
+            return None
+        width = int(match.group(1))
+        return placeholder_png(width, width * 3 // 2, match.group(2))
+
+    def route(self, path: str, params: Dict[str, str]) -> Optional[dict]:
+        if path.startswith('/3/'):
+            path = path[2:]
+        match = _MOVIE_PATH.match(path)
+        if match:
+            return self.movie(int(match.group(1)))
+        if path == '/discover/movie':
+            return self.discover(params)
+        if path == '/genre/movie/list':
+            return self.genres()
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MockTMDBServer"
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def do_GET(self):
+        tmdb = self.server.tmdb
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        time.sleep(tmdb.delay())
+
+        status = tmdb.injected_error()
+        if status is not None:
+            self._send(status, {'status_code': 25 if status == 429 else 11, 'status_message': "Injected error"},
+                       retry_after=1 if status == 429 else None)
+            return
+        if url.path.startswith('/t/p/'):
+            image = tmdb.image(url.path)
+            if image is None:
+                self._send(404, {'status_code': 34, 'status_message': "The resource you requested could not be found."})
+            else:
+                self._send_bytes(200, image, 'image/png')
+            return
+        try:
+            body = tmdb.route(url.path, params)
+        except ValueError:
+            self._send(422, {'status_code': 22, 'status_message': "Invalid parameters"})
+            return
+        if body is None:
+            self._send(404, {'status_code': 34, 'status_message': "The resource you requested could not be found."})
+        else:
+            self._send(200, body)
+
+    def _send(self, status: int, body: dict, retry_after: Optional[int] = None):
+        self._send_bytes(status, json.dumps(body).encode(), 'application/json;charset=utf-8', retry_after)
+
+    def _send_bytes(self, status: int, payload: bytes, content_type: str, retry_after: Optional[int] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class MockTMDBServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, tmdb: MockTMDB, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.tmdb = tmdb
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/3"
+
+
+def start(tmdb: MockTMDB, host: str = '127.0.0.1', port: int = 0) -> MockTMDBServer:
+    """Serve `tmdb` on a background thread; port 0 picks a free port (see base_url)."""
+    server = MockTMDBServer(tmdb, host, port)
+    threading.Thread(target=server.serve_forever, name="mock-tmdb", daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Data and fault-injection options, shared with load_test.py."""
+    parser.add_argument('--posters', default=POSTER_CACHE_FILE, help="poster_cache.json to serve from")
+    parser.add_argument('--movies', default=MOVIES_FILE, help="catalog pickle, for titles and popularity order")
+    parser.add_argument('--latency', type=float, default=0.0, help="base response time in milliseconds")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="mean of an exponential delay added on top, in milliseconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with an error")
+    parser.add_argument('--error-status', type=int, nargs='+', default=list(ERROR_STATUSES),
+                        help="statuses to pick injected errors from")
+    parser.add_argument('--fault-seed', type=int, help="seed for latency and error injection")
+
+
+def from_arguments(args: argparse.Namespace) -> MockTMDB:
+    return MockTMDB.from_files(args.posters, args.movies, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                               error_rate=args.error_rate, error_statuses=args.error_status, seed=args.fault_seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the TMDB API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    tmdb = from_arguments(args)
+    server = MockTMDBServer(tmdb, args.host, args.port)
+    logger.info(f"Serving {len(tmdb.movies)} movies at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Served {tmdb.requests} requests, {tmdb.errors} injected errors")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
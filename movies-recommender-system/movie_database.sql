@@ -13,7 +13,9 @@ CREATE TABLE IF NOT EXISTS search_history (
     username VARCHAR(255) NOT NULL,
     movie_id INT NOT NULL,
     movie_title VARCHAR(255) NOT NULL,
-    searched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    searched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_search_user_movie (username, movie_id),
+    KEY idx_search_user_time (username, searched_at, movie_id, movie_title)
 );
 
 -- Genre search history table
@@ -21,9 +23,23 @@ CREATE TABLE IF NOT EXISTS genre_search_history (
     id INT AUTO_INCREMENT PRIMARY KEY,
     username VARCHAR(255) NOT NULL,
     genre_name VARCHAR(255) NOT NULL,
-    searched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    searched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_genre_user_genre (username, genre_name),
+    KEY idx_genre_user_time (username, searched_at, genre_name)
 );
 
+-- Existing databases: db_auth.init_db() adds missing keys on startup, or run by hand:
+-- DELETE FROM search_history WHERE id NOT IN (
+--     SELECT id FROM (SELECT MAX(id) AS id FROM search_history GROUP BY username, movie_id) AS keep);
+-- ALTER TABLE search_history
+--     ADD UNIQUE KEY uq_search_user_movie (username, movie_id),
+--     ADD KEY idx_search_user_time (username, searched_at, movie_id, movie_title);
+-- DELETE FROM genre_search_history WHERE id NOT IN (
+--     SELECT id FROM (SELECT MAX(id) AS id FROM genre_search_history GROUP BY username, genre_name) AS keep);
+-- ALTER TABLE genre_search_history
+--     ADD UNIQUE KEY uq_genre_user_genre (username, genre_name),
+--     ADD KEY idx_genre_user_time (username, searched_at, genre_name);
+
 drop table genre_search_history;
 select * from users;
 select * from search_history;
@@ -0,0 +1,175 @@
+import os
+import argparse
+import pickle as pkl
+import logging
+from typing import Tuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# On-disk layout: <dir>/ids.npy (int32, N x K) and <dir>/scores.npy (float32/float16, N x K)
+NEIGHBOR_INDEX_DIR = 'neighbor_index'
+IDS_FILE = 'ids.npy'
+SCORES_FILE = 'scores.npy'
+DEFAULT_K = 20
+MISSING = -1  # padding id when a movie has fewer than K neighbors
+
+
+class NeighborIndex:
+    """Top-K most similar catalog rows per movie, best first, self excluded.
+
+    Both arrays are normally memory-mapped, so a lookup only touches the K
+    entries of one row instead of a dense N x N similarity matrix.
+    """
+
+    def __init__(self, ids: np.ndarray, scores: np.ndarray):
+        if ids.shape != scores.shape or ids.ndim != 2:
+            raise ValueError(f"ids {ids.shape} and scores {scores.shape} must be matching N x K arrays")
+        self.ids = ids
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return self.ids.shape[0]
+
+    @property
+    def k(self) -> int:
+        return self.ids.shape[1]
+
+    def neighbors(self, row: int, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (catalog rows, scores) of the k nearest neighbors of `row`."""
+        k = min(k, self.k)
+        ids = np.asarray(self.ids[row, :k])
+        scores = np.asarray(self.scores[row, :k], dtype=np.float32)
+        valid = ids != MISSING
+        return ids[valid], scores[valid]
+
+    def neighbors_many(self, rows, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Neighbor lists of many rows in one gather: (len(rows) x k ids, scores), MISSING-padded."""
+        rows = np.asarray(rows, dtype=np.int64)
+        k = min(k, self.k)
+        return np.asarray(self.ids[rows, :k]), np.asarray(self.scores[rows, :k], dtype=np.float32)
+
+    def blend(self, rows, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Rank the union of several rows' neighbor lists, excluding the rows themselves.
+
+        A candidate's score is the sum of its similarities to the seeds, so movies
+        close to several seeds rank above movies close to only one.
+        """
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        ids = np.asarray(self.ids[rows]).ravel()
+        scores = np.asarray(self.scores[rows], dtype=np.float32).ravel()
+        keep = (ids != MISSING) & ~np.isin(ids, rows)
+        if not keep.any():
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        candidates, inverse = np.unique(ids[keep], return_inverse=True)
+        totals = np.bincount(inverse, weights=scores[keep]).astype(np.float32)
+        take = min(k, len(candidates))
+        top = np.argpartition(-totals, take - 1)[:take]
+        top = top[np.lexsort((candidates[top], -totals[top]))]
+        return candidates[top].astype(np.int32), totals[top]
+
+    def save(self, directory: str = NEIGHBOR_INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+        for name, array in ((IDS_FILE, self.ids), (SCORES_FILE, self.scores)):
+            path = os.path.join(directory, name)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def create(cls, directory: str, n: int, k: int, score_dtype=np.float32) -> "NeighborIndex":
+        """Allocate a writable on-disk index to be filled block by block, then commit()-ed."""
+        os.makedirs(directory, exist_ok=True)
+        ids = np.lib.format.open_memmap(os.path.join(directory, IDS_FILE + '.tmp'), mode='w+',
+                                        dtype=np.int32, shape=(n, k))
+        scores = np.lib.format.open_memmap(os.path.join(directory, SCORES_FILE + '.tmp'), mode='w+',
+                                           dtype=score_dtype, shape=(n, k))
+        return cls(ids, scores)
+
+    def commit(self, directory: str):
+        """Flush an index from create() and atomically move it into place."""
+        self.ids.flush()
+        self.scores.flush()
+        for name in (IDS_FILE, SCORES_FILE):
+            path = os.path.join(directory, name)
+            os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, directory: str = NEIGHBOR_INDEX_DIR, mmap: bool = True) -> "NeighborIndex":
+        mmap_mode = 'r' if mmap else None
+        ids = np.load(os.path.join(directory, IDS_FILE), mmap_mode=mmap_mode)
+        scores = np.load(os.path.join(directory, SCORES_FILE), mmap_mode=mmap_mode)
+        return cls(ids, scores)
+
+
+def top_k_rows(block: np.ndarray, k: int, row_offset: int = 0,
+               self_cols: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Select the top k entries of each row of a dense similarity block.
+
+    `row_offset` is the catalog row of block[0] (or pass `self_cols` for
+    non-contiguous rows); each row's own column is excluded. Rows with fewer
+    than k candidates are padded with MISSING.
+    """
+    block = np.array(block, dtype=np.float32, copy=True)
+    n_rows, n_cols = block.shape
+    rows = np.arange(n_rows)
+    if self_cols is None:
+        self_cols = rows + row_offset
+    in_block = (self_cols >= 0) & (self_cols < n_cols)
+    block[rows[in_block], self_cols[in_block]] = -np.inf
+
+    take = min(k, n_cols)
+    if take < n_cols:
+        part = np.argpartition(-block, take - 1, axis=1)[:, :take]
+    else:
+        part = np.tile(np.arange(n_cols), (n_rows, 1))
+    part_scores = np.take_along_axis(block, part, axis=1)
+    order = np.lexsort((part, -part_scores), axis=1)  # best first, ties by row
+
+    ids = np.full((n_rows, k), MISSING, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+    ids[:, :take] = np.take_along_axis(part, order, axis=1)
+    scores[:, :take] = np.take_along_axis(part_scores, order, axis=1)
+
+    empty = ~np.isfinite(scores)
+    ids[empty] = MISSING
+    scores[empty] = 0.0
+    return ids, scores
+
+
+def from_dense(similarity, k: int = DEFAULT_K, block_size: int = 1024,
+               score_dtype=np.float32) -> NeighborIndex:
+    """Build a NeighborIndex from a dense N x N similarity matrix, block by block."""
+    n = similarity.shape[0]
+    ids = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=score_dtype)
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        block_ids, block_scores = top_k_rows(similarity[start:end], k, row_offset=start)
+        ids[start:end] = block_ids
+        scores[start:end] = block_scores
+    return NeighborIndex(ids, scores)
+
+
+# --- Convert a legacy similarity.pkl into a neighbor index ---
+def main():
+    parser = argparse.ArgumentParser(description="Convert a dense similarity.pkl into a top-K neighbor index.")
+    parser.add_argument('similarity', nargs='?', default='similarity.pkl', help="pickled N x N similarity matrix")
+    parser.add_argument('--out', default=NEIGHBOR_INDEX_DIR, help="output directory")
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help="neighbors kept per movie")
+    parser.add_argument('--float16', action='store_true', help="store scores as float16")
+    args = parser.parse_args()
+
+    with open(args.similarity, 'rb') as f:
+        similarity = pkl.load(f)
+    index = from_dense(similarity, k=args.k, score_dtype=np.float16 if args.float16 else np.float32)
+    index.save(args.out)
+    logger.info(f"Wrote {len(index)} x {index.k} neighbor index to {args.out}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,61 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+import metrics
+
+# bcrypt runs in a small process pool so a burst of logins can't starve the
+# Streamlit script threads of CPU. The pool and the queue in front of it are
+# bounded; callers beyond that wait up to HASH_TIMEOUT and then fail.
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # cost factor for new hashes
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+MAX_QUEUED = int(os.getenv("AUTH_HASH_QUEUE", str(HASH_WORKERS * 8)))  # running + waiting jobs
+HASH_TIMEOUT = float(os.getenv("AUTH_HASH_TIMEOUT", "10"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_QUEUED)
+
+
+def _hashpw(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process full of Streamlit threads isn't safe
+                _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def _run(fn, *args):
+    if not _slots.acquire(timeout=HASH_TIMEOUT):
+        raise TimeoutError("Password hashing queue is full")
+    try:
+        return _get_pool().submit(fn, *args).result(timeout=HASH_TIMEOUT)
+    finally:
+        _slots.release()
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    with metrics.span('password_hash'):
+        return _run(_hashpw, password.encode(), rounds).decode()
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    with metrics.span('password_verify'):
+        return _run(_checkpw, password.encode(), hashed.encode())
@@ -0,0 +1,347 @@
+import os
+import re
+import io
+import time
+import hashlib
+import importlib.util
+import argparse
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+import requests
+
+import metrics
+from poster_store import PosterStore
+from single_flight import SingleFlight
+
+# Serves TMDB posters from a local disk cache so pages stop pulling full-size
+# images from image.tmdb.org on every view:
+#
+#   GET /poster/thumb/<file>.jpg   185 px wide, for the grids
+#   GET /poster/full/<file>.jpg    500 px wide, for the details view
+#
+# Each image is downloaded once (thumbnails are resized from the full image
+# with Pillow, or taken from TMDB's own w185 rendition without it), stored
+# under its SHA-256 and served with a one-year immutable Cache-Control.
+# The cache is trimmed least-recently-used first once it passes
+# POSTER_CACHE_MAX_MB.
+#
+#   POSTER_PROXY_PORT=8502      app.py starts the proxy on this port
+#   POSTER_PROXY_URL=https://example.com/posters   where browsers reach it (required for links)
+#   python poster_proxy.py --port 8502             or run it as its own process
+#
+# The page HTML goes to every user's browser, so links need the public,
+# same-scheme URL of the proxy (typically a reverse-proxy path on the app's
+# own origin). Without POSTER_PROXY_URL, poster_src() links TMDB directly,
+# still at the size each view needs.
+
+logger = logging.getLogger(__name__)
+
+POSTER_CACHE_DIR = os.getenv("POSTER_CACHE_DIR", "poster_images")
+POSTER_CACHE_MAX_MB = float(os.getenv("POSTER_CACHE_MAX_MB", "512"))
+POSTER_PROXY_PORT = int(os.getenv("POSTER_PROXY_PORT", "0"))  # 0: no proxy
+POSTER_PROXY_URL = os.getenv("POSTER_PROXY_URL", "").rstrip('/')
+TMDB_IMAGE_URL = os.getenv("TMDB_IMAGE_URL", "https://image.tmdb.org/t/p")  # mock_tmdb.py serves /t/p too
+VARIANTS = {'thumb': 185, 'full': 500}  # width in px; TMDB has w185 and w500 renditions of every poster
+THUMB_QUALITY = 82
+CACHE_CONTROL = "public, max-age=31536000, immutable"  # a file name never changes content on TMDB
+DOWNLOAD_TIMEOUT = 10
+EVICT_TO = 0.9  # share of the limit left after an eviction pass, so passes stay rare
+TOUCH_INTERVAL = 3600  # seconds; hits refresh an object's mtime (its LRU stamp) at most this often
+
+_FILE_NAME = re.compile(r"^[A-Za-z0-9_\-]+\.(?:jpg|jpeg|png|webp)$")
+_TMDB_IMAGE = re.compile(r"/t/p/[^/]+/([A-Za-z0-9_\-]+\.(?:jpg|jpeg|png|webp))$")
+
+REQUESTS = metrics.counter('poster_proxy_requests_total', "Poster requests by variant and result",
+                           ('variant', 'result'))
+UPSTREAM_SECONDS = metrics.histogram('poster_proxy_upstream_seconds', "Poster downloads from TMDB", ('size',))
+
+
+class DiskCache:
+    """Content-addressed blobs on disk (objects/<aa>/<sha256>), bounded by total size.
+
+    An index maps cache keys to digests, so identical bytes are stored once.
+    The object files' mtimes are the LRU order; several processes can share
+    one directory.
+    """
+
+    def __init__(self, directory: str = POSTER_CACHE_DIR, max_bytes: int = int(POSTER_CACHE_MAX_MB * 1024 * 1024)):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, 'objects')
+        self.max_bytes = max_bytes
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.index = PosterStore(os.path.join(directory, 'index.db'), table='poster_files')
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._total = sum(size for _, size, _ in self._objects())
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _objects(self):
+        """(path, size, mtime) of every stored object."""
+        for shard in os.scandir(self.objects_dir):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if not entry.name.endswith('.tmp'):
+                        stat = entry.stat()
+                        yield entry.path, stat.st_size, stat.st_mtime
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        """(digest, bytes), or None if the key is unknown or its object was evicted."""
+        digest = self.index.get(key)
+        if digest is None:
+            return None
+        path = self._path(digest)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL:
+                os.utime(path)
+        except FileNotFoundError:
+            return None
+        return digest, data
+
+    def put(self, key: str, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._total += len(data)
+        self.index.put(key, digest)
+        if self._total > self.max_bytes:
+            self.evict()
+        return digest
+
+    def evict(self):
+        """Delete least recently used objects until the cache is under EVICT_TO of its limit."""
+        if not self._evict_lock.acquire(blocking=False):
+            return  # another thread is already trimming
+        try:
+            objects = sorted(self._objects(), key=lambda obj: obj[2])
+            total = sum(size for _, size, _ in objects)
+            removed = 0
+            for path, size, _ in objects:
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass  # another process evicted it first
+                total -= size
+                removed += 1
+            with self._lock:
+                self._total = total
+            if removed:
+                logger.info(f"Evicted {removed} posters, {total / 1024 / 1024:.0f} MB left")
+        finally:
+            self._evict_lock.release()
+
+
+def resize(data: bytes, width: int) -> bytes:
+    """JPEG of the image scaled down to `width` px, aspect ratio kept."""
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert('RGB')
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, 'JPEG', quality=THUMB_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+def image_type(data: bytes) -> str:
+    """MIME type from the image's own signature, not its file name."""
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    return 'application/octet-stream'
+
+
+def _have_pillow() -> bool:
+    return importlib.util.find_spec('PIL') is not None
+
+
+class PosterProxy:
+    """Posters by variant and TMDB file name, from the disk cache or downloaded once."""
+
+    def __init__(self, cache: DiskCache, image_url: str = TMDB_IMAGE_URL, session: Optional[requests.Session] = None):
+        self.cache = cache
+        self.image_url = image_url.rstrip('/')
+        self.session = session or requests.Session()
+        self.flights = SingleFlight()
+        self.resize_locally = _have_pillow()
+
+    def get(self, variant: str, filename: str) -> Tuple[str, bytes]:
+        """(digest, bytes); raises ValueError for a bad variant or name, requests errors upstream."""
+        if variant not in VARIANTS or not _FILE_NAME.match(filename):
+            raise ValueError(f"No poster {variant}/{filename}")
+        key = f"{variant}/{filename}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            REQUESTS.inc(variant=variant, result='hit')
+            return cached
+        REQUESTS.inc(variant=variant, result='miss')
+        # Concurrent requests for one poster share a single download
+        return self.flights.do(key, lambda: self._fetch(variant, filename))
+
+    def _fetch(self, variant: str, filename: str) -> Tuple[str, bytes]:
+        if variant == 'full' or not self.resize_locally:
+            data = self._download(f"w{VARIANTS[variant]}", filename)
+        else:
+            _, full = self.get('full', filename)
+            data = resize(full, VARIANTS[variant])
+        return self.cache.put(f"{variant}/{filename}", data), data
+
+    def _download(self, size: str, filename: str) -> bytes:
+        with UPSTREAM_SECONDS.time(size=size):
+            response = self.session.get(f"{self.image_url}/{size}/{filename}", timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+
+# --- Links from the app ---
+def public_url() -> str:
+    """Base URL browsers use for the proxy; empty when pages should link TMDB."""
+    return POSTER_PROXY_URL
+
+
+def poster_src(url: str, variant: str = 'thumb') -> str:
+    """Where a page should load a TMDB poster URL from, at the size `variant` needs.
+
+    Placeholders and other non-TMDB URLs are returned unchanged.
+    """
+    match = _TMDB_IMAGE.search(url or '')
+    if not match:
+        return url
+    base = public_url()
+    if base:
+        return f"{base}/poster/{variant}/{match.group(1)}"
+    return f"{TMDB_IMAGE_URL}/w{VARIANTS[variant]}/{match.group(1)}"
+
+
+# --- HTTP server ---
+class _Handler(BaseHTTPRequestHandler):
+    server: "PosterProxyServer"
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'poster':
+            self._error(404)
+            return
+        _, variant, filename = parts
+        try:
+            digest, data = self.server.proxy.get(variant, filename)
+        except ValueError:
+            self._error(404)
+            return
+        except requests.HTTPError as e:
+            REQUESTS.inc(variant=variant, result='error')
+            self._error(404 if e.response is not None and e.response.status_code == 404 else 502)
+            return
+        except Exception as e:
+            REQUESTS.inc(variant=variant, result='error')
+            logger.error(f"Poster {variant}/{filename} failed: {e}")
+            self._error(502)
+            return
+
+        etag = f'"{digest}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', CACHE_CONTROL)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', image_type(data))
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', CACHE_CONTROL)
+        self.send_header('ETag', etag)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int):
+        # Not cached, so a poster that failed once is retried on the next view
+        self.send_response(status)
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class PosterProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, proxy: PosterProxy, host: str = '0.0.0.0', port: int = POSTER_PROXY_PORT):
+        super().__init__((host, port), _Handler)
+        self.proxy = proxy
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def start(port: int = POSTER_PROXY_PORT) -> Optional[PosterProxyServer]:
+    """Serve the proxy on a background thread if POSTER_PROXY_PORT is set; once per process."""
+    global _started
+    with _start_lock:
+        if _started or not port:
+            return None
+        _started = True
+    try:
+        server = PosterProxyServer(PosterProxy(DiskCache()), port=port)
+    except OSError as e:
+        # Another worker on this host got the port first; it serves the same cache directory
+        logger.warning(f"Poster proxy not started on port {port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="poster-proxy", daemon=True).start()
+    logger.info(f"Serving posters on :{port}")
+    if not POSTER_PROXY_URL:
+        logger.warning("POSTER_PROXY_URL is not set: pages keep linking TMDB until it names the proxy's public URL")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve cached, resized TMDB posters.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=POSTER_PROXY_PORT or 8502)
+    parser.add_argument('--dir', default=POSTER_CACHE_DIR, help="cache directory")
+    parser.add_argument('--max-mb', type=float, default=POSTER_CACHE_MAX_MB, help="cache size limit")
+    parser.add_argument('--image-url', default=TMDB_IMAGE_URL, help="upstream image base URL")
+    args = parser.parse_args()
+
+    cache = DiskCache(args.dir, int(args.max_mb * 1024 * 1024))
+    server = PosterProxyServer(PosterProxy(cache, args.image_url), args.host, args.port)
+    logger.info(f"Serving posters on {args.host}:{args.port} from {args.dir} "
+                f"({cache.total_bytes / 1024 / 1024:.0f} of {args.max_mb:.0f} MB used)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
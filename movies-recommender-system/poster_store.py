@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import List, Optional
+
+from write_queue import WriteQueue, FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+POSTER_DB_FILE = 'poster_cache.db'
+FLUSH_BATCH_SIZE = 100
+
+
+class PosterStore:
+    """TMDB metadata cache in SQLite (WAL mode), keyed by movie_id.
+
+    Writes are buffered and committed by a background thread in one
+    transaction per batch, so the request path never serializes the cache.
+    WAL lets every Streamlit worker on the host read and write the same file
+    safely; readers never see a half-written batch.
+    """
+
+    def __init__(self, path: str = POSTER_DB_FILE, flush_interval: float = FLUSH_INTERVAL,
+                 batch_size: int = FLUSH_BATCH_SIZE, table: str = 'posters'):
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+
+        with self._transaction() as conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    cache_key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+        self._writes = WriteQueue(self._write_rows, name=f"{table}-writer",
+                                  flush_interval=flush_interval, batch_size=batch_size)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections can't be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._conn())
+
+    # --- Reads ---
+    def get(self, key) -> Optional[object]:
+        key = str(key)
+        queued = self._writes.get(key)
+        raw = queued[1] if queued is not None else None
+        if raw is None:
+            row = self._conn().execute(
+                f"SELECT data FROM {self.table} WHERE cache_key = ?", (key,)).fetchone()
+            raw = row[0] if row else None
+        return json.loads(raw) if raw is not None else None
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    # --- Writes ---
+    def put(self, key, value):
+        """Queue a write; it becomes durable at the next batch commit."""
+        key = str(key)
+        self._writes.put(key, (key, json.dumps(value)))
+
+    def flush(self):
+        """Commit every queued write now, as one transaction."""
+        self._writes.flush()
+
+    def _write_rows(self, rows: List[tuple]):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (cache_key, data, updated_at) VALUES (?, ?, ?)",
+                [(key, raw, now) for key, raw in rows])
+
+    def close(self):
+        self._writes.close()
+
+    # --- One-time import of the legacy JSON cache ---
+    def import_json(self, json_path: str) -> int:
+        """Copy entries from a poster_cache.json file once; later calls are no-ops.
+
+        Existing rows win over the JSON copy, which is older by definition.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        marker = f"imported:{os.path.abspath(json_path)}"
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+                return 0
+            try:
+                with open(json_path, 'r') as f:
+                    legacy = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Could not import {json_path}: {e}")
+                return 0
+            now = time.time()
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table} (cache_key, data, updated_at) VALUES (?, ?, ?)",
+                [(str(key), json.dumps(value), now) for key, value in legacy.items()])
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (marker, str(now)))
+        logger.info(f"Imported {len(legacy)} entries from {json_path} into {self.path}")
+        return len(legacy)
+
+
+class _Transaction:
+    """`with` block that runs as one IMMEDIATE transaction (commit or rollback)."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -0,0 +1,160 @@
+import os
+import sys
+import hmac
+import time
+import logging
+import threading
+from collections import Counter
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+import streamlit as st
+
+# Opt-in sampling profiler for live script reruns. While a rerun (or a
+# fragment rerun) executes, a background thread samples the script thread's
+# stack every PROFILE_INTERVAL seconds and counts the stacks in the folded
+# format flame graph tools read (flamegraph.pl, speedscope, inferno):
+#
+#   profiles/reruns/<time>-<section>.folded   one file per profiled rerun
+#   profiles/<section>.folded                 running total per section
+#
+# Switched on for every session with PROFILE_RERUNS=1, or for one session by
+# opening the app with ?profile=<PROFILE_TOKEN>. With neither configured,
+# rerun() returns at once and section() hands back the undecorated function.
+
+logger = logging.getLogger(__name__)
+
+PROFILE_RERUNS = os.getenv("PROFILE_RERUNS", "") == "1"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # admin secret for ?profile=...
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # seconds between samples
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "500"))  # per-rerun files kept; older ones are deleted
+ENABLED = PROFILE_RERUNS or bool(PROFILE_TOKEN)
+
+_active: Dict[int, "_Sampler"] = {}  # script thread id -> its running sampler
+_write_lock = threading.Lock()
+
+
+def _requested() -> bool:
+    """Profile this session? Checked per rerun, so the token can be added or dropped from the URL."""
+    if PROFILE_RERUNS:
+        return True
+    token = st.query_params.get("profile")
+    return bool(token) and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())  # str compare rejects non-ASCII
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class _Sampler(threading.Thread):
+    """Samples one thread's stack below `root` until `root` leaves that stack."""
+
+    def __init__(self, thread_id: int, root, section: str, interval: float = PROFILE_INTERVAL):
+        super().__init__(name=f"profile-{section}", daemon=True)
+        self.thread_id = thread_id
+        self.root = root
+        self.section = section
+        self.interval = interval
+        self.stacks = Counter()
+        self.finished = threading.Event()
+
+    def run(self):
+        began = time.perf_counter()
+        try:
+            while not self.finished.is_set():
+                frame = sys._current_frames().get(self.thread_id)
+                stack = []
+                while frame is not None and frame is not self.root:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if frame is None:
+                    # The rerun is over, however it ended (st.stop and st.rerun raise)
+                    break
+                stack.append(f"[{self.section}]")  # root frame, named after the section
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.finished.wait(self.interval)
+        finally:
+            if _active.get(self.thread_id) is self:
+                del _active[self.thread_id]
+            _write(self.section, self.stacks, time.perf_counter() - began)
+
+
+def _start(root, section: str) -> Optional[_Sampler]:
+    thread_id = threading.get_ident()
+    if thread_id in _active:
+        return None  # already inside a profiled rerun; its stacks include this section
+    sampler = _Sampler(thread_id, root, section)
+    _active[thread_id] = sampler
+    sampler.start()
+    return sampler
+
+
+# --- Output ---
+def _merge_folded(path: str, stacks: Counter):
+    total = Counter(stacks)
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack:
+                    total[stack] += int(count)
+    _write_folded(path, total)
+
+
+def _write_folded(path: str, stacks: Counter):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp_path, path)
+
+
+def _write(section: str, stacks: Counter, seconds: float):
+    if not stacks:
+        return
+    reruns_dir = os.path.join(PROFILE_DIR, 'reruns')
+    stamp = time.strftime('%Y%m%d-%H%M%S') + f"-{int(time.time() * 1000) % 1000:03d}"
+    path = os.path.join(reruns_dir, f"{stamp}-{section}.folded")
+    try:
+        with _write_lock:
+            os.makedirs(reruns_dir, exist_ok=True)
+            _write_folded(path, stacks)
+            _merge_folded(os.path.join(PROFILE_DIR, f"{section}.folded"), stacks)
+            for old in sorted(os.listdir(reruns_dir))[:-PROFILE_KEEP]:
+                os.remove(os.path.join(reruns_dir, old))
+    except OSError as e:
+        logger.error(f"Could not write profile for {section}: {e}")
+        return
+    logger.info(f"Profiled {section} rerun: {seconds * 1000:.0f} ms, {sum(stacks.values())} samples -> {path}")
+
+
+# --- Entry points for app.py ---
+def rerun(section: str = 'page'):
+    """Call at the top of the script: profiles the rest of this rerun, if switched on."""
+    if not ENABLED or not _requested():
+        return
+    _start(sys._getframe(1), section)
+
+
+def section(name: str) -> Callable:
+    """Decorator for a fragment: its own reruns are profiled and tagged `name`.
+
+    Inside a profiled full rerun the fragment's stacks are already part of
+    that profile, so nothing extra happens.
+    """
+    def decorate(fn: Callable) -> Callable:
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            sampler = _start(sys._getframe(), name) if _requested() else None
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if sampler is not None:
+                    sampler.finished.set()
+        return wrapper
+    return decorate
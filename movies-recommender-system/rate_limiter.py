@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `burst` at once.
+
+    One instance is shared by every session in the process, so callers only
+    wait when the process as a whole is over budget.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be > 0 and burst >= 1")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until a token is available; False if `timeout` seconds pass first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+class AttemptLimiter:
+    """Per-key failure counter: after `max_failures` within `window` seconds the key is locked out.
+
+    Used to cap password guesses per username; a success clears the key.
+    """
+    MAX_KEYS = 10000
+
+    def __init__(self, max_failures: int, window: float):
+        self.max_failures = max_failures
+        self.window = window
+        self._failures: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> Deque[float]:
+        failures = self._failures.get(key)
+        if failures is None:
+            return deque()
+        while failures and now - failures[0] >= self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+        return failures
+
+    def retry_after(self, key: str) -> float:
+        """Seconds until `key` may try again; 0 if it isn't locked out."""
+        with self._lock:
+            now = time.monotonic()
+            failures = self._prune(key, now)
+            if len(failures) < self.max_failures:
+                return 0.0
+            return failures[-self.max_failures] + self.window - now
+
+    def record_failure(self, key: str):
+        with self._lock:
+            now = time.monotonic()
+            if len(self._failures) >= self.MAX_KEYS:
+                # Drop expired keys so guesses against many usernames can't grow this forever
+                for stale_key in list(self._failures):
+                    self._prune(stale_key, now)
+            self._prune(key, now)
+            self._failures.setdefault(key, deque()).append(now)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._failures.pop(key, None)
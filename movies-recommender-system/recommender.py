@@ -0,0 +1,45 @@
+from typing import List, Sequence
+
+import numpy as np
+
+import metrics
+from neighbor_index import NeighborIndex, MISSING
+from title_index import TitleIndex
+
+
+def resolve_titles(title_index: TitleIndex, titles: Sequence[str]) -> np.ndarray:
+    """Catalog row for each title, MISSING where it can't be resolved."""
+    rows = [title_index.lookup(title) for title in titles]
+    return np.array([MISSING if row is None else row for row in rows], dtype=np.int64)
+
+
+# --- Batch recommendations ---
+def recommend_many(title_index: TitleIndex, neighbors: NeighborIndex, titles: Sequence[str],
+                   k: int = 5) -> List[List[int]]:
+    """Top-k recommended catalog rows for every title, in one pass over the index.
+
+    Unresolved titles get an empty list.
+    """
+    with metrics.span('resolve_titles'):
+        rows = resolve_titles(title_index, titles)
+    found = rows != MISSING
+    results = [[] for _ in titles]
+    if found.any():
+        with metrics.span('neighbor_search'):
+            ids, _ = neighbors.neighbors_many(rows[found], k)
+        for slot, row_ids in zip(np.flatnonzero(found), ids):
+            results[slot] = [int(i) for i in row_ids if i != MISSING]
+    return results
+
+
+def recommend_blended(title_index: TitleIndex, neighbors: NeighborIndex, titles: Sequence[str],
+                      k: int = 5) -> List[int]:
+    """One ranked list for several liked titles ("because you watched X, Y, Z"), seeds excluded."""
+    with metrics.span('resolve_titles'):
+        rows = resolve_titles(title_index, titles)
+    rows = rows[rows != MISSING]
+    if len(rows) == 0:
+        return []
+    with metrics.span('neighbor_search'):
+        ids, _ = neighbors.blend(rows, k)
+    return [int(i) for i in ids]
@@ -0,0 +1,49 @@
+import os
+import hmac
+import time
+import base64
+import hashlib
+import logging
+import secrets
+from typing import Optional
+
+# Signed "who is logged in" tokens. A session that reconnects presents its
+# token (from a cookie, see db_auth.restore_session) instead of a password,
+# so it skips the bcrypt check.
+#
+#   token = base64url(username) "." expires_at "." hex(HMAC-SHA256(secret, first two parts))
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(8 * 3600)))  # seconds; db_auth also revokes on logout
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+if not SESSION_SECRET:
+    # Tokens then only survive as long as this process
+    logger.warning("SESSION_SECRET is not set; using a random per-process key")
+    SESSION_SECRET = secrets.token_hex(32)
+_KEY = SESSION_SECRET.encode()
+
+
+def _sign(payload: str) -> str:
+    return hmac.new(_KEY, payload.encode(), hashlib.sha256).hexdigest()
+
+
+def issue(username: str, ttl: int = SESSION_TTL) -> str:
+    name = base64.urlsafe_b64encode(username.encode()).decode().rstrip("=")
+    payload = f"{name}.{int(time.time()) + ttl}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify(token: Optional[str]) -> Optional[str]:
+    """Username from a valid, unexpired token; None otherwise."""
+    if not token:
+        return None
+    try:
+        name, expires_at, signature = token.split(".")
+        if not hmac.compare_digest(signature.encode(), _sign(f"{name}.{expires_at}").encode()):
+            return None
+        if int(expires_at) < time.time():
+            return None
+        return base64.urlsafe_b64decode(name + "=" * (-len(name) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
@@ -5,4 +5,6 @@ port=$PORT\n\
 enableCORS=false\n\
 headless=true\n\
 \n\
-" > ~/.streamlit/config.toml
\ No newline at end of file
+" > ~/.streamlit/config.toml
+# Build and publish the serving artifacts (catalog + neighbor index) on first deploy
+[ -f artifacts/CURRENT ] || python artifacts.py publish
@@ -0,0 +1,16 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+# The app's modules are flat files in the directory above, imported by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def tmdb(tmp_path, monkeypatch):
+    # tmdb.py opens its stores in the working directory at import
+    monkeypatch.chdir(tmp_path)
+    import tmdb
+    return importlib.reload(tmdb)
@@ -0,0 +1,19 @@
+import os
+import sys
+import subprocess
+
+import ann_index
+import artifacts
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_load_scipy():
+    # Every worker imports artifacts before the login screen; scipy is only for the 'ann' engine
+    code = "import sys, artifacts; print('scipy' in sys.modules)"
+    out = subprocess.run([sys.executable, '-c', code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == 'False'
+
+
+def test_ann_index_dir_matches():
+    assert artifacts.ANN_INDEX_DIR == ann_index.ANN_INDEX_DIR
@@ -0,0 +1,105 @@
+import sys
+import random
+
+import numpy as np
+import pytest
+
+import artifacts
+import build_similarity
+from catalog import Catalog
+
+WORDS = [f"word{i}" for i in range(40)]
+
+
+def make_movies(n: int, seed: int):
+    rng = random.Random(seed)
+    return [{'movie_id': 1000 + i, 'title': f"Movie {i}", 'tags': ' '.join(rng.sample(WORDS, rng.randint(3, 12)))}
+            for i in range(n)]
+
+
+def save(movies, path):
+    build_similarity.save_movies([m['movie_id'] for m in movies], [m['title'] for m in movies],
+                                 [m['tags'] for m in movies], str(path))
+
+
+@pytest.fixture
+def movies():
+    movies = make_movies(60, seed=1)
+    # Every word appears in the first 50, so a full build over all 60 fits the same vocabulary
+    movies[0]['tags'] = ' '.join(WORDS[:20])
+    movies[1]['tags'] = ' '.join(WORDS[20:])
+    return movies
+
+
+def changed_batch(movies):
+    batch = [dict(m) for m in movies[50:]]  # 10 new movies
+    for m in movies[5:8]:  # and 3 changed ones
+        batch.append(dict(m, tags=' '.join(reversed(m['tags'].split()[:4])) + ' word39'))
+    return batch
+
+
+def apply(movies, batch):
+    merged = {m['movie_id']: m for m in movies}
+    for m in batch:
+        merged[m['movie_id']] = m
+    old = [m['movie_id'] for m in movies]
+    return [merged[i] for i in old] + [m for m in batch if m['movie_id'] not in set(old)]
+
+
+def test_update_matches_full_build(tmp_path, movies):
+    base = movies[:50]
+    batch = changed_batch(movies)
+
+    save(base, tmp_path / 'incremental.pkl')
+    build_similarity.build(str(tmp_path / 'incremental.pkl'), str(tmp_path / 'inc_index'),
+                           catalog_dir=str(tmp_path / 'inc_catalog'), block_size=16)
+    incremental = build_similarity.update(batch, str(tmp_path / 'incremental.pkl'), str(tmp_path / 'inc_index'),
+                                          catalog_dir=str(tmp_path / 'inc_catalog'), block_size=16)
+
+    save(apply(base, batch), tmp_path / 'full.pkl')
+    full = build_similarity.build(str(tmp_path / 'full.pkl'), str(tmp_path / 'full_index'),
+                                  catalog_dir=str(tmp_path / 'full_catalog'), block_size=16)
+
+    np.testing.assert_array_equal(incremental.ids, full.ids)
+    np.testing.assert_allclose(incremental.scores, full.scores, atol=1e-6)
+    assert build_similarity.load_movies(str(tmp_path / 'incremental.pkl')) == \
+        build_similarity.load_movies(str(tmp_path / 'full.pkl'))
+    inc_catalog, full_catalog = Catalog.load(str(tmp_path / 'inc_catalog')), Catalog.load(str(tmp_path / 'full_catalog'))
+    np.testing.assert_array_equal(inc_catalog.movie_ids, full_catalog.movie_ids)
+    assert inc_catalog.titles == full_catalog.titles
+
+
+def test_update_from_catalog_leaves_the_pickle_alone(tmp_path, movies):
+    save(movies[:50], tmp_path / 'movies.pkl')
+    build_similarity.build(str(tmp_path / 'movies.pkl'), str(tmp_path / 'index'), catalog_dir=str(tmp_path / 'catalog'))
+    before = (tmp_path / 'movies.pkl').read_bytes()
+
+    index = build_similarity.update(changed_batch(movies), None, str(tmp_path / 'index'),
+                                    catalog_dir=str(tmp_path / 'catalog'))
+
+    assert len(index) == 60
+    assert len(Catalog.load(str(tmp_path / 'catalog'))) == 60
+    assert (tmp_path / 'movies.pkl').read_bytes() == before
+
+
+def run_artifacts(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['artifacts.py', *args, '--workers', '1'])
+    artifacts.main()
+
+
+def test_update_after_rollback(tmp_path, monkeypatch, movies):
+    monkeypatch.chdir(tmp_path)
+    save(movies[:50], tmp_path / 'movies_dict.pkl')
+    (tmp_path / 'first.json').write_text(__import__('json').dumps(movies[50:55]))
+    (tmp_path / 'second.json').write_text(__import__('json').dumps(movies[55:]))
+
+    run_artifacts(monkeypatch, 'publish')
+    run_artifacts(monkeypatch, 'update', 'first.json')
+    assert len(artifacts.load(artifacts.current_version()).catalog) == 55
+    run_artifacts(monkeypatch, 'rollback')
+    assert len(artifacts.load(artifacts.current_version()).catalog) == 50
+
+    run_artifacts(monkeypatch, 'update', 'second.json')
+    served = artifacts.load(artifacts.current_version())
+    assert len(served.catalog) == 55
+    assert 1055 in set(served.catalog.movie_ids.tolist()) and 1050 not in set(served.catalog.movie_ids.tolist())
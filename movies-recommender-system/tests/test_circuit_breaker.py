@@ -0,0 +1,111 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', clock)
+    return clock
+
+
+def breaker(transitions=None, **kwargs):
+    kwargs = {'failure_rate': 0.5, 'min_calls': 4, 'window': 30, 'cooldown': 15, 'probe_timeout': 10, **kwargs}
+    on_transition = (lambda old, new: transitions.append((old, new))) if transitions is not None else None
+    return CircuitBreaker('tmdb', on_transition=on_transition, **kwargs)
+
+
+def test_opens_once_enough_calls_fail(clock):
+    transitions = []
+    b = breaker(transitions)
+    for _ in range(3):
+        b.record_failure()
+    assert b.state == CLOSED  # below min_calls
+    b.record_failure()
+    assert b.state == OPEN
+    assert not b.allow()
+    assert b.retry_after() == 15
+    assert transitions == [(CLOSED, OPEN)]
+
+
+def test_stays_closed_below_the_failure_rate(clock):
+    b = breaker()
+    b.record_success()
+    for _ in range(3):
+        b.record_success()
+        b.record_failure()  # 3 of 7 failed at most
+    assert b.state == CLOSED
+    assert b.stats()['window_failures'] == 3
+
+
+def test_old_outcomes_leave_the_window(clock):
+    b = breaker()
+    for _ in range(3):
+        b.record_failure()
+    clock.now += 30
+    b.record_failure()
+    assert b.state == CLOSED
+    assert b.stats()['window_calls'] == 1
+
+
+def test_half_open_lets_one_probe_through(clock):
+    transitions = []
+    b = breaker(transitions)
+    for _ in range(4):
+        b.record_failure()
+    clock.now += 15
+    assert b.allow()
+    assert b.state == HALF_OPEN
+    assert not b.allow()  # the probe is still out
+    b.record_success()
+    assert b.state == CLOSED
+    assert b.allow()
+    assert transitions == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]
+
+
+def test_failed_probe_opens_again(clock):
+    b = breaker()
+    for _ in range(4):
+        b.record_failure()
+    clock.now += 15
+    assert b.allow()
+    b.record_failure()
+    assert b.state == OPEN
+    assert b.retry_after() == 15
+
+
+def test_lost_probe_is_replaced(clock):
+    b = breaker()
+    for _ in range(4):
+        b.record_failure()
+    clock.now += 15
+    assert b.allow()
+    clock.now += 10
+    assert b.allow()  # the first probe never reported back
+    assert b.stats()['rejected'] == 0
+
+
+def test_rejections_are_counted(clock):
+    b = breaker()
+    for _ in range(4):
+        b.record_failure()
+    assert not b.allow()
+    assert not b.allow()
+    assert b.stats() == {'open': 1, 'half_open': 0, 'window_calls': 0, 'window_failures': 0, 'rejected': 2}
+
+
+def test_rejects_bad_settings():
+    with pytest.raises(ValueError):
+        CircuitBreaker('tmdb', failure_rate=0)
+    with pytest.raises(ValueError):
+        CircuitBreaker('tmdb', min_calls=0)
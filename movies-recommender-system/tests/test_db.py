@@ -0,0 +1,30 @@
+import pytest
+
+import db
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    backend = db.SQLiteBackend(str(tmp_path / 'movies_db.db'))
+    monkeypatch.setattr(db, '_backend', backend)
+    db.execute(backend.ddl("""
+        CREATE TABLE genre_search_history (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(255) NOT NULL,
+            genre_name VARCHAR(255) NOT NULL,
+            searched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (username, genre_name)
+        )
+    """))
+    return backend
+
+
+def test_upsert_writes_the_given_timestamp(backend):
+    query = backend.upsert('genre_search_history', ('username', 'genre_name', 'searched_at'),
+                           ('username', 'genre_name'))
+    db.executemany(query, [('alice', 'Drama', '2020-01-01 10:00:00'), ('bob', 'Drama', '2020-01-01 10:01:00')])
+    db.executemany(query, [('alice', 'Drama', '2020-01-01 10:05:00')])
+    assert db.fetchall("SELECT username, genre_name, searched_at FROM genre_search_history ORDER BY id") == [
+        ('alice', 'Drama', '2020-01-01 10:05:00'),
+        ('bob', 'Drama', '2020-01-01 10:01:00'),
+    ]
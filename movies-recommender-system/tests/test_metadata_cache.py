@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from poster_store import PosterStore
+from metadata_cache import MetadataCache, HIT, STALE, NEGATIVE, MISS
+
+MOVIE = ('https://image.tmdb.org/t/p/w500/x.jpg', '1999', 'Overview', ['Action'], '1999-03-31', 136, 8.2)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PosterStore(str(tmp_path / 'cache.db'))
+    yield store
+    store.close()
+
+
+def test_fresh_entry_is_a_hit(store):
+    cache = MetadataCache(store)
+    cache.put(603, MOVIE)
+    assert cache.get(603) == (MOVIE, HIT)
+
+
+def test_unknown_id_is_a_miss(store):
+    assert MetadataCache(store).get(603) == (None, MISS)
+
+
+def test_legacy_seven_field_row_is_fresh_only_for_static_fields(store):
+    store.put(603, list(MOVIE))  # imported from poster_cache.json: no timestamp
+    store.flush()
+    cache = MetadataCache(store)
+    assert cache.get(603, need_volatile=False) == (MOVIE, HIT)
+    assert cache.get(603, need_volatile=True) == (MOVIE, STALE)
+
+
+def test_legacy_four_field_row_is_a_miss(store):
+    store.put(10764, list(MOVIE[:4]))
+    store.flush()
+    cache = MetadataCache(store)
+    assert cache.get(10764, need_volatile=False) == (None, MISS)
+    assert cache.get(10764, need_volatile=True) == (None, MISS)
+
+
+def test_expired_rating_is_stale(store):
+    cache = MetadataCache(store, volatile_ttl=0.05)
+    cache.put(603, MOVIE)
+    time.sleep(0.1)
+    assert cache.get(603, need_volatile=True) == (MOVIE, STALE)
+    assert cache.get(603, need_volatile=False) == (MOVIE, HIT)
+
+
+def test_expired_static_fields_are_stale(store):
+    cache = MetadataCache(store, static_ttl=0.05)
+    cache.put(603, MOVIE)
+    time.sleep(0.1)
+    assert cache.get(603, need_volatile=False) == (MOVIE, STALE)
+
+
+def test_stale_entry_is_reloaded_from_the_store(store):
+    cache = MetadataCache(store, volatile_ttl=0.05)
+    cache.put(603, MOVIE)
+    time.sleep(0.1)
+    # Another worker refreshed the movie in the shared store
+    MetadataCache(store).put(603, MOVIE[:6] + (8.3,))
+    assert cache.get(603) == (MOVIE[:6] + (8.3,), HIT)
+
+
+def test_negative_entry_expires(store):
+    cache = MetadataCache(store, negative_ttl=0.05)
+    cache.put_negative(603)
+    assert cache.get(603) == (None, NEGATIVE)
+    time.sleep(0.1)
+    assert cache.get(603) == (None, MISS)
+
+
+def test_lru_is_bounded(store):
+    cache = MetadataCache(store, lru_size=2)
+    for movie_id in (1, 2, 3):
+        cache.put(movie_id, MOVIE)
+    assert cache.stats()['size'] == 2
+    assert cache.stats()['evictions'] == 1
+    assert cache.get(1) == (MOVIE, HIT)  # still in the store
+
+
+def test_get_cached_movie_data_rejects_short_tuples(tmdb):
+    tmdb.metadata_cache.put(10764, MOVIE[:4])
+    assert tmdb.get_cached_movie_data(10764, need_volatile=False) is None
+
+
+def test_get_cached_movie_data_returns_fallback_for_negative_ids(tmdb):
+    tmdb.metadata_cache.put_negative(603)
+    assert tmdb.get_cached_movie_data(603) is tmdb.FALLBACK_MOVIE_DATA
@@ -0,0 +1,32 @@
+import session_token
+
+
+def test_token_round_trips_the_username():
+    assert session_token.verify(session_token.issue('alice')) == 'alice'
+
+
+def test_non_ascii_username():
+    assert session_token.verify(session_token.issue('zoë.ü')) == 'zoë.ü'
+
+
+def test_expired_token_is_rejected():
+    assert session_token.verify(session_token.issue('alice', ttl=-1)) is None
+
+
+def test_tampered_token_is_rejected():
+    name, expires_at, signature = session_token.issue('alice').split('.')
+    other = session_token.issue('mallory').split('.')[0]
+    assert session_token.verify(f"{other}.{expires_at}.{signature}") is None
+    assert session_token.verify(f"{name}.{int(expires_at) + 3600}.{signature}") is None
+    assert session_token.verify(f"{name}.{expires_at}.{'0' * len(signature)}") is None
+
+
+def test_token_signed_with_another_key_is_rejected(monkeypatch):
+    token = session_token.issue('alice')
+    monkeypatch.setattr(session_token, '_KEY', b'another secret')
+    assert session_token.verify(token) is None
+
+
+def test_malformed_tokens_are_rejected():
+    for token in (None, '', 'abc', 'a.b', 'a.b.c.d', 'YWxpY2U.soon.00', 'YWxpY2U.9999999999.é'):
+        assert session_token.verify(token) is None
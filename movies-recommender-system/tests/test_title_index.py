@@ -0,0 +1,44 @@
+from title_index import TitleIndex, normalize_title
+
+TITLES = ['Avatar', 'The Dark Knight', 'The Dark Knight Rises', 'Amélie', 'Batman Begins', 'Avatar', 'Up', 'Cars']
+
+
+def test_normalize_title():
+    assert normalize_title('  Amélie: The  Movie! ') == 'amelie the movie'
+
+
+def test_exact_title_wins_over_longer_ones():
+    index = TitleIndex(TITLES)
+    assert index.lookup('the dark knight') == 1
+    assert index.lookup('AMELIE') == 3
+
+
+def test_duplicate_titles_go_to_the_earlier_row():
+    assert TitleIndex(TITLES).lookup('Avatar') == 0
+
+
+def test_duplicate_titles_go_to_the_more_popular_row():
+    popularity = [1, 0, 0, 0, 0, 5, 0, 0]
+    assert TitleIndex(TITLES, popularity).lookup('Avatar') == 5
+
+
+def test_substring_match_prefers_popularity():
+    assert TitleIndex(TITLES).lookup('dark kni') == 1
+    popularity = [0, 1, 2, 0, 0, 0, 0, 0]
+    assert TitleIndex(TITLES, popularity).lookup('dark kni') == 2
+
+
+def test_short_query_scans_titles():
+    assert TitleIndex(TITLES).lookup('ar') == 0  # 'avatar' comes before 'cars'
+
+
+def test_typo_falls_back_to_trigrams():
+    index = TitleIndex(TITLES)
+    assert index.lookup('Batmn Begins') == 4
+    assert index.lookup('The Drak Knight Rises') == 2
+
+
+def test_no_match():
+    index = TitleIndex(TITLES)
+    assert index.lookup('zzzzzz') is None
+    assert index.lookup('  !! ') is None
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+import mock_tmdb
+
+MOVIES = {
+    603: {'id': 603, 'title': 'The Matrix', 'poster_path': '/matrix.jpg', 'release_date': '1999-03-31',
+          'overview': 'Neo', 'genres': [{'id': 28, 'name': 'Action'}], 'vote_average': 8.2, 'popularity': 90.0,
+          'runtime': 136},
+    13: {'id': 13, 'title': 'Forrest Gump', 'poster_path': '/gump.jpg', 'release_date': '1994-07-06',
+         'overview': 'Run', 'genres': [{'id': 18, 'name': 'Drama'}], 'vote_average': 8.5, 'popularity': 80.0,
+         'runtime': 142},
+}
+# What the recent-genres panel asks for: one poster query per recent genre
+QUERIES = [{'language': 'en-US', 'sort_by': 'popularity.desc', 'with_genres': genre_id, 'page': 1}
+           for genre_id in (28, 18, 35, 27, 878)]
+
+
+@pytest.fixture
+def server(tmdb, monkeypatch):
+    """Starts a mock TMDB with the given latency (seconds) and points tmdb at it."""
+    servers = []
+
+    def start(latency=0.0):
+        servers.append(mock_tmdb.start(mock_tmdb.MockTMDB(MOVIES, latency=latency)))
+        monkeypatch.setattr(tmdb, 'BASE_URL', servers[-1].base_url)
+
+    yield start
+    for s in servers:
+        s.shutdown()
+
+
+def test_discover_many_returns_results_in_order(tmdb, server):
+    server()
+    results = tmdb.discover_many(QUERIES[:3])
+    assert [r['results'][0]['id'] if r['results'] else None for r in results] == [603, 13, None]
+
+
+def test_discover_many_shares_one_deadline_against_a_hung_tmdb(tmdb, server):
+    server(latency=30)
+    began = time.monotonic()
+    results = tmdb.discover_many(QUERIES, timeout=1.0)
+    elapsed = time.monotonic() - began
+    # Sequential calls would take REQUEST_DEADLINE (4 s) each
+    assert elapsed < 1.5
+    assert results == [None] * len(QUERIES)
+
+
+def test_discover_many_serves_cached_queries_while_tmdb_hangs(tmdb, server):
+    server()
+    tmdb.discover_many(QUERIES[:1])
+    server(latency=30)
+    results = tmdb.discover_many(QUERIES[:2], timeout=0.5)
+    assert results[0]['results'][0]['id'] == 603
+    assert results[1] is None
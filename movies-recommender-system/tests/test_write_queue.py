@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+
+import pytest
+
+from poster_store import PosterStore
+from write_queue import WriteQueue
+
+
+class FakeTable:
+    """write_batch target: rows are (key, value); value None violates a NOT NULL constraint."""
+
+    def __init__(self):
+        self.rows = {}
+        self.calls = 0
+        self.down = False
+        self.lock = threading.Lock()
+
+    def write(self, rows):
+        with self.lock:
+            self.calls += 1
+            if self.down:
+                raise sqlite3.OperationalError("database is locked")
+            if any(value is None for _, value in rows):
+                raise sqlite3.IntegrityError("NOT NULL constraint failed")
+            self.rows.update(rows)
+
+
+@pytest.fixture
+def table():
+    return FakeTable()
+
+
+def make_queue(table, **kwargs):
+    # A long interval keeps the background thread out of the way; the tests flush by hand
+    return WriteQueue(table.write, flush_interval=3600, **kwargs)
+
+
+def test_flush_writes_the_newest_row_per_key(table):
+    queue = make_queue(table)
+    queue.put('a', ('a', 1))
+    queue.put('b', ('b', 1))
+    queue.put('a', ('a', 2))
+    assert queue.get('a') == ('a', 2)
+    assert queue.pending() == [('b', 1), ('a', 2)]
+    queue.flush()
+    assert table.rows == {'a': 2, 'b': 1}
+    assert table.calls == 1
+    assert queue.pending() == [] and queue.get('a') is None
+
+
+def test_bad_row_does_not_block_the_others(table):
+    queue = make_queue(table, max_attempts=3)
+    queue.put('good', ('good', 1))
+    queue.put('bad', ('bad', None))
+    queue.flush()
+    assert table.rows == {'good': 1}
+    assert queue.pending() == [('bad', None)]
+
+    queue.put('later', ('later', 1))
+    queue.flush()
+    queue.flush()
+    assert table.rows == {'good': 1, 'later': 1}
+    assert queue.pending() == []
+    assert list(queue.dead_letters) == [('bad', None)]
+
+
+def test_newer_row_replaces_a_failed_one(table):
+    queue = make_queue(table)
+    queue.put('a', ('a', None))
+    queue.flush()
+    queue.put('a', ('a', 5))
+    queue.flush()
+    assert table.rows == {'a': 5}
+    assert not queue.dead_letters
+
+
+def test_database_errors_keep_rows_queued(table):
+    queue = make_queue(table, max_attempts=2)
+    queue.put('a', ('a', 1))
+    table.down = True
+    for _ in range(5):
+        queue.flush()
+    assert queue.pending() == [('a', 1)]
+    assert not queue.dead_letters
+    table.down = False
+    queue.flush()
+    assert table.rows == {'a': 1}
+
+
+def test_close_drains_the_queue(table):
+    queue = make_queue(table)
+    queue.put('a', ('a', 1))
+    queue.close()
+    assert table.rows == {'a': 1}
+
+
+def test_poster_store_reads_its_queued_writes(tmp_path):
+    store = PosterStore(str(tmp_path / 'cache.db'), flush_interval=3600)
+    store.put(603, {'data': [1, 2]})
+    assert store.get(603) == {'data': [1, 2]}
+    store.flush()
+    assert PosterStore(str(tmp_path / 'cache.db')).get(603) == {'data': [1, 2]}
+    store.close()
@@ -0,0 +1,107 @@
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+FUZZY_THRESHOLD = 0.5  # share of the query's trigrams a title must contain to count as a typo match
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    title = unicodedata.normalize('NFKD', title)
+    title = ''.join(ch for ch in title if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', title.lower()).strip()
+
+
+def trigrams(text: str, pad: bool = True) -> set:
+    if pad:
+        text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TitleIndex:
+    """Title -> catalog position lookups, built once per catalog.
+
+    Resolution order: exact normalized title, then substring match, then
+    trigram similarity for typos. Ties go to the more popular movie; without
+    a popularity column the catalog order is used, which in movies_dict.pkl
+    follows the TMDB 5000 source (biggest releases first).
+    """
+
+    def __init__(self, titles: Sequence[str], popularity: Optional[Sequence[float]] = None):
+        self.normalized = [normalize_title(t) for t in titles]
+        n = len(self.normalized)
+        if popularity is None:
+            popularity = -np.arange(n, dtype=np.float64)
+        # rank[i] < rank[j] means i wins a tie against j
+        self.rank = np.empty(n, dtype=np.int64)
+        self.rank[np.argsort(-np.asarray(popularity, dtype=np.float64), kind='stable')] = np.arange(n)
+
+        exact: Dict[str, List[int]] = defaultdict(list)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        self.gram_counts = np.empty(n, dtype=np.int32)
+        for i, title in enumerate(self.normalized):
+            exact[title].append(i)
+            grams = trigrams(title)
+            self.gram_counts[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+        self.exact = {title: min(rows, key=self.rank.__getitem__) for title, rows in exact.items()}
+        self.postings = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.normalized)
+
+    def lookup(self, query: str) -> Optional[int]:
+        """Catalog position of the best match for `query`, or None."""
+        query = normalize_title(query)
+        if not query:
+            return None
+
+        row = self.exact.get(query)
+        if row is not None:
+            return row
+
+        matches = self._substring_matches(query)
+        if len(matches):
+            return int(matches[np.argmin(self.rank[matches])])
+
+        return self._fuzzy_match(query)
+
+    def _substring_matches(self, query: str) -> np.ndarray:
+        grams = trigrams(query, pad=False)
+        if not grams:
+            # Too short for trigrams: scan the (small) normalized title list
+            return np.asarray([i for i, title in enumerate(self.normalized) if query in title], dtype=np.int32)
+        lists = sorted((self.postings.get(g) for g in grams), key=lambda p: 0 if p is None else len(p))
+        if lists[0] is None:
+            return np.empty(0, dtype=np.int32)
+        candidates = lists[0]
+        for posting in lists[1:]:
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            if len(candidates) == 0:
+                break
+        # Shared trigrams don't guarantee adjacency, so confirm the substring
+        return np.asarray([i for i in candidates if query in self.normalized[i]], dtype=np.int32)
+
+    def _fuzzy_match(self, query: str) -> Optional[int]:
+        grams = trigrams(query)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return None
+        shared = np.bincount(np.concatenate(lists), minlength=len(self))
+        candidates = np.flatnonzero(shared)
+        shared = shared[candidates]
+        # How much of the query a title covers, then how close it is overall
+        coverage = shared / len(grams)
+        jaccard = shared / (len(grams) + self.gram_counts[candidates] - shared)
+        good = coverage >= FUZZY_THRESHOLD
+        if not good.any():
+            return None
+        candidates, coverage, jaccard = candidates[good], coverage[good], jaccard[good]
+        best = np.lexsort((self.rank[candidates], -jaccard, -coverage))[0]
+        return int(candidates[best])
@@ -0,0 +1,396 @@
+import os
+import re
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Tuple, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from rate_limiter import TokenBucket
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from poster_store import PosterStore, POSTER_DB_FILE
+from metadata_cache import MetadataCache, NEGATIVE, STALE, FIELD_COUNT
+from discover_cache import DiscoverCache
+
+# TMDB client shared by every Streamlit session in the process. app.py is
+# re-executed on every rerun, so anything that must outlive a rerun (HTTP
+# connection pool, rate limiter, worker threads, poster store) lives here.
+#
+# Every call has a deadline: get() retries within TMDB_REQUEST_DEADLINE
+# seconds, and fetch_movie_data_many() hands back whatever is ready after
+# TMDB_BATCH_DEADLINE, with placeholders for the rest (those fetches finish
+# in the background and fill the cache). discover_many() runs several
+# discover queries within one shared TMDB_BATCH_DEADLINE. When most recent calls failed, the
+# circuit breaker opens and calls fail at once until a probe succeeds, so a
+# TMDB outage costs a page cached data and placeholders, not minutes.
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+API_KEY = os.getenv("TMDB_API_KEY", "3176ec361fc0532ffae0928e2f2dc5a0")
+BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")  # mock_tmdb.py for local runs
+IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/500x750/gray/white?text=No+Image+Available"
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10  # per attempt; the deadline usually cuts it shorter
+REQUEST_DEADLINE = float(os.getenv("TMDB_REQUEST_DEADLINE", "4"))  # seconds for one call, retries included
+BATCH_DEADLINE = float(os.getenv("TMDB_BATCH_DEADLINE", "5"))  # seconds fetch_movie_data_many waits
+MAX_ATTEMPTS = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF = 0.25  # seconds before the first retry, doubled after each, jittered
+BREAKER_FAILURE_RATE = float(os.getenv("TMDB_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_MIN_CALLS = int(os.getenv("TMDB_BREAKER_MIN_CALLS", "10"))
+BREAKER_WINDOW = float(os.getenv("TMDB_BREAKER_WINDOW", "30"))  # seconds of outcomes considered
+BREAKER_COOLDOWN = float(os.getenv("TMDB_BREAKER_COOLDOWN", "15"))  # seconds open before a probe
+RATE_LIMIT_PER_SEC = float(os.getenv("TMDB_RATE_LIMIT", "20"))  # network calls per second, per process
+RATE_LIMIT_BURST = int(os.getenv("TMDB_RATE_BURST", "10"))
+MAX_WORKERS = int(os.getenv("TMDB_MAX_WORKERS", "8"))
+
+MovieData = Tuple[str, str, str, List[str], str, Optional[int], float]
+FALLBACK_MOVIE_DATA: MovieData = (PLACEHOLDER_IMAGE, 'N/A', 'No overview available.', [], 'N/A', 0, 0.0)
+RUNTIME = 5  # position of runtime in MovieData; None on a card that has no details yet
+
+# Retries happen in get(), within the call's deadline; urllib3 must not add its own
+session = requests.Session()
+adapter = HTTPAdapter(max_retries=0, pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+session.mount("http://", adapter)
+session.mount("https://", adapter)
+
+rate_limiter = TokenBucket(RATE_LIMIT_PER_SEC, RATE_LIMIT_BURST)
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tmdb")
+
+# --- Metrics ---
+REQUEST_SECONDS = metrics.histogram('tmdb_request_seconds', "TMDB calls, retries and backoff included", ('endpoint',))
+RESPONSES = metrics.counter('tmdb_responses_total', "TMDB responses by final status code", ('endpoint', 'status'))
+RETRIES = metrics.counter('tmdb_retries_total', "TMDB attempts retried, by what the failed attempt got",
+                          ('endpoint', 'reason'))
+ERRORS = metrics.counter('tmdb_errors_total', "TMDB calls that raised before a response", ('endpoint', 'error'))
+BREAKER_TRANSITIONS = metrics.counter('tmdb_breaker_transitions_total', "TMDB circuit breaker state changes",
+                                      ('from_state', 'to_state'))
+BATCH_TIMEOUTS = metrics.counter('tmdb_batch_timeouts_total',
+                                 "Movies or discover queries a batch call gave up waiting for")
+_ID_SEGMENT = re.compile(r"/\d+")
+
+
+class DeadlineExceeded(requests.Timeout):
+    """A TMDB call ran out of its time budget, retries included."""
+
+
+class Deadline:
+    """A time budget that several attempts, or several calls, draw from."""
+    __slots__ = ('expires_at',)
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+def _on_breaker_transition(old: str, new: str):
+    BREAKER_TRANSITIONS.inc(from_state=old, to_state=new)
+    if new == 'open':
+        logger.warning(f"TMDB circuit breaker {old} -> open: serving cached data for {BREAKER_COOLDOWN:.0f}s")
+    else:
+        logger.info(f"TMDB circuit breaker {old} -> {new}")
+
+
+breaker = CircuitBreaker('TMDB', failure_rate=BREAKER_FAILURE_RATE, min_calls=BREAKER_MIN_CALLS,
+                         window=BREAKER_WINDOW, cooldown=BREAKER_COOLDOWN, probe_timeout=REQUEST_DEADLINE,
+                         on_transition=_on_breaker_transition)
+metrics.register_collector('tmdb_breaker', "TMDB circuit breaker state and counters (see CircuitBreaker.stats)",
+                           breaker.stats, label='counter')
+
+
+def endpoint_label(url: str) -> str:
+    """'/movie/{id}' for f"{BASE_URL}/movie/603": one label value per endpoint, not per movie."""
+    path = url[len(BASE_URL):] if url.startswith(BASE_URL) else url
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
+def _retry_delay(response: Optional[requests.Response], attempt: int) -> float:
+    """Seconds to wait before the next attempt: TMDB's Retry-After if given, else jittered backoff."""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass  # an HTTP date; TMDB sends seconds
+    return BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+
+
+def get(url: str, params: dict, deadline: Optional[Deadline] = None) -> requests.Response:
+    """GET a TMDB endpoint, retrying 429/5xx and network errors until `deadline`.
+
+    Returns the last response (raise_for_status() is up to the caller).
+    Raises CircuitOpenError at once while the breaker is open, and
+    DeadlineExceeded when the budget runs out before an answer. Only real
+    network calls spend rate-limit tokens.
+    """
+    endpoint = endpoint_label(url)
+    if deadline is None:
+        deadline = Deadline(REQUEST_DEADLINE)
+    began = time.perf_counter()
+    try:
+        for attempt in range(MAX_ATTEMPTS):
+            if not breaker.allow():
+                raise CircuitOpenError(breaker.name, breaker.retry_after())
+            with metrics.span('tmdb_rate_limit_wait'):
+                acquired = rate_limiter.acquire(timeout=deadline.remaining())
+            if not acquired:
+                raise DeadlineExceeded(f"No rate-limit token for {endpoint} before the deadline")
+            remaining = deadline.remaining()
+            if not remaining:
+                raise DeadlineExceeded(f"No time left for {endpoint}")
+            response = None
+            try:
+                response = session.get(url, params=params,
+                                       timeout=(min(CONNECT_TIMEOUT, remaining), min(READ_TIMEOUT, remaining)))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                breaker.record_failure()
+                reason = type(e).__name__
+                failure = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()  # a 404 is a healthy answer
+                    break
+                breaker.record_failure()
+                reason = str(response.status_code)
+                failure = None
+
+            delay = _retry_delay(response, attempt)
+            if attempt + 1 == MAX_ATTEMPTS or delay >= deadline.remaining():
+                if response is not None:
+                    break  # the caller sees the 429/5xx
+                raise failure
+            RETRIES.inc(endpoint=endpoint, reason=reason)
+            time.sleep(delay)
+    except Exception as e:
+        ERRORS.inc(endpoint=endpoint, error=type(e).__name__)
+        raise
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - began, endpoint=endpoint)
+    RESPONSES.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+
+# Poster cache: SQLite store shared by all workers, seeded once from the legacy JSON file
+POSTER_CACHE_FILE = 'poster_cache.json'
+poster_store = PosterStore(POSTER_DB_FILE)
+poster_store.import_json(POSTER_CACHE_FILE)
+# TTL'd, size-bounded LRU in front of the store; see metadata_cache.py for the knobs
+metadata_cache = MetadataCache(poster_store)
+metrics.register_collector('tmdb_metadata_cache', "Movie metadata cache counters (see MetadataCache.stats)",
+                           metadata_cache.stats, label='counter')
+_refreshing = set()
+_refresh_lock = threading.Lock()
+# /discover/movie responses, shared across sessions and workers (TTL'd, coalesced)
+discover_cache = DiscoverCache(PosterStore(POSTER_DB_FILE, table='discover'))
+metrics.register_collector('tmdb_discover_cache', "/discover/movie cache counters (see DiscoverCache.stats)",
+                           discover_cache.stats, label='counter')
+
+
+def discover(params: dict, deadline: Optional[Deadline] = None) -> dict:
+    """GET /discover/movie through the shared cache; params exclude the api_key.
+
+    Identical queries arriving at once make a single upstream call and all
+    callers share its result (or its exception). `deadline` bounds the
+    upstream call; by default it gets its own REQUEST_DEADLINE.
+    """
+    def fetch():
+        res = get(f"{BASE_URL}/discover/movie", dict(params, api_key=API_KEY), deadline)
+        res.raise_for_status()
+        return res.json()
+
+    return discover_cache.get_or_fetch(params, fetch)
+
+
+def discover_many(queries: List[dict], timeout: float = BATCH_DEADLINE) -> List[Optional[dict]]:
+    """discover() for several queries at once, in input order.
+
+    The queries run concurrently on the shared executor and draw on one
+    Deadline, so a hung TMDB costs the caller `timeout` in total rather than
+    REQUEST_DEADLINE per query. A query that fails or isn't answered in time
+    comes back as None.
+    """
+    with metrics.span('tmdb_discover_many'):
+        deadline = Deadline(timeout)
+        futures = [executor.submit(discover, params, deadline) for params in queries]
+        wait(futures, timeout=timeout)
+        results = []
+        for params, future in zip(queries, futures):
+            if not future.done():
+                BATCH_TIMEOUTS.inc()
+                results.append(None)
+                continue
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.warning(f"Failed to discover {params}: {e}")
+                results.append(None)
+        return results
+
+
+def get_cached_movie_data(movie_id: int, need_volatile: bool = True) -> Optional[MovieData]:
+    """Cached data without waiting on the network.
+
+    Returns the cached tuple (stale entries too, refreshed in the background),
+    FALLBACK_MOVIE_DATA for an id that recently failed, or None on a miss.
+    """
+    data, outcome = metadata_cache.get(movie_id, need_volatile)
+    if outcome == NEGATIVE:
+        return FALLBACK_MOVIE_DATA
+    if data is not None and len(data) != FIELD_COUNT:
+        return None  # not a full MovieData; refetch it
+    if outcome == STALE:
+        _refresh_in_background(movie_id)
+    return data
+
+
+def _refresh_in_background(movie_id: int):
+    with _refresh_lock:
+        if movie_id in _refreshing:
+            return
+        _refreshing.add(movie_id)
+
+    def refresh():
+        try:
+            refresh_movie_data(movie_id, negative_on_failure=False)
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(movie_id)
+
+    executor.submit(refresh)
+
+
+def fetch_movie_data(movie_id: int, need_volatile: bool = True, deadline: Optional[Deadline] = None) -> MovieData:
+    if not movie_id or movie_id <= 0:
+        return FALLBACK_MOVIE_DATA
+
+    cached = get_cached_movie_data(movie_id, need_volatile)
+    if cached:
+        return cached
+    return refresh_movie_data(movie_id, deadline=deadline)
+
+
+def refresh_movie_data(movie_id: int, negative_on_failure: bool = True,
+                       deadline: Optional[Deadline] = None) -> MovieData:
+    """Fetch from TMDB and update the cache, ignoring what is cached now."""
+    url = f"{BASE_URL}/movie/{movie_id}"
+    params = {'api_key': API_KEY, 'language': 'en-US'}
+
+    try:
+        response = get(url, params, deadline)
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            # Unknown or deleted id: no point asking again soon
+            logger.error(f"TMDB returned {response.status_code} for movie {movie_id}")
+            metadata_cache.put_negative(movie_id)
+            return FALLBACK_MOVIE_DATA
+        response.raise_for_status()
+        data = response.json()
+
+        poster_path = data.get('poster_path')
+        poster_url = f"{IMAGE_BASE_URL}{poster_path}" if poster_path else PLACEHOLDER_IMAGE
+
+        release_date = data.get('release_date', 'N/A')
+        year = release_date.split("-")[0] if release_date and len(release_date) >= 4 else 'N/A'
+
+        overview = data.get('overview', 'No overview available.').replace('"', "'").strip()
+
+        genres_data = data.get('genres', [])
+        genres = [genre['name'] for genre in genres_data]
+
+        runtime = data.get('runtime', 0)  # minutes
+        vote_avg = data.get('vote_average', 0.0)  # rating
+
+        # cache full 7-tuple (persisted in the background)
+        movie_data = (poster_url, year, overview, genres, release_date, runtime, vote_avg)
+        metadata_cache.put(movie_id, movie_data)
+        return movie_data
+
+    except (CircuitOpenError, requests.RequestException) as e:
+        # TMDB is down, slow or overloaded, not this id: don't block it once TMDB recovers
+        logger.warning(f"Failed to fetch movie data for {movie_id}: {e}")
+    except Exception as e:
+        logger.error(f"Failed to fetch movie data for {movie_id}: {e}")
+        if negative_on_failure:
+            metadata_cache.put_negative(movie_id)
+    # fallback (7 values)
+    return FALLBACK_MOVIE_DATA
+
+
+def fetch_movie_data_many(movie_ids: List[int], need_volatile: bool = True) -> List[MovieData]:
+    """fetch_movie_data for several ids at once, in input order.
+
+    Cache hits return immediately; misses run concurrently on the shared
+    executor, throttled only by the process-wide rate limiter. Movies not
+    fetched within BATCH_DEADLINE come back as FALLBACK_MOVIE_DATA; their
+    fetches carry on and fill the cache for the next rerun.
+    """
+    with metrics.span('tmdb_fetch_many'):
+        return _fetch_movie_data_many(movie_ids, need_volatile)
+
+
+def _fetch_movie_data_many(movie_ids: List[int], need_volatile: bool) -> List[MovieData]:
+    results = [None] * len(movie_ids)
+    pending = {}
+    for i, movie_id in enumerate(movie_ids):
+        if movie_id and movie_id > 0:
+            cached = get_cached_movie_data(movie_id, need_volatile)
+        else:
+            cached = FALLBACK_MOVIE_DATA
+        if cached:
+            results[i] = cached
+        else:
+            pending[i] = executor.submit(fetch_movie_data, movie_id, need_volatile=need_volatile)
+
+    wait(pending.values(), timeout=BATCH_DEADLINE)
+    for i, future in pending.items():
+        if not future.done():
+            BATCH_TIMEOUTS.inc()
+            results[i] = FALLBACK_MOVIE_DATA
+            continue
+        try:
+            results[i] = future.result()
+        except Exception as e:
+            logger.error(f"Failed to fetch movie data for {movie_ids[i]}: {e}")
+            results[i] = FALLBACK_MOVIE_DATA
+    return results
+
+
+# --- Grid cards ---
+def card_from_discover(movie: dict, genre_names: Dict[int, str]) -> MovieData:
+    """MovieData for a grid card, straight from a /discover/movie result.
+
+    Discover results carry everything a card shows, so grids cost no
+    /movie/{id} calls. Runtime isn't among them: it stays None until
+    fetch_details() runs for the card.
+    """
+    poster_path = movie.get('poster_path')
+    poster_url = f"{IMAGE_BASE_URL}{poster_path}" if poster_path else PLACEHOLDER_IMAGE
+    release_date = movie.get('release_date') or 'N/A'
+    year = release_date.split("-")[0] if len(release_date) >= 4 else 'N/A'
+    overview = (movie.get('overview') or 'No overview available.').replace('"', "'").strip()
+    genres = [genre_names[genre_id] for genre_id in movie.get('genre_ids', []) if genre_id in genre_names]
+    return (poster_url, year, overview, genres, release_date, None, movie.get('vote_average', 0.0))
+
+
+def fetch_details(movie_id: int, card: MovieData) -> MovieData:
+    """Full MovieData for a card's details view; one /movie/{id} call, then cached.
+
+    If TMDB can't be reached the card itself is returned, runtime 0.
+    """
+    if card[RUNTIME] is not None:
+        return card
+    data = fetch_movie_data(movie_id)
+    if data is FALLBACK_MOVIE_DATA:
+        return card[:RUNTIME] + (0,) + card[RUNTIME + 1:]
+    return data
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import argparse
+import logging
+import pickle as pkl
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import tmdb
+from metadata_cache import HIT
+from rate_limiter import TokenBucket
+
+# Walks every movie_id in the catalog and fetches metadata that is missing
+# or expired, so user clicks hit the cache. Progress is checkpointed after
+# every chunk; rerunning the command resumes where it stopped.
+#
+#   python warm_cache.py --rate 20            # deploy time / nightly
+#   python warm_cache.py --restart            # ignore the checkpoint
+
+logger = logging.getLogger(__name__)
+
+MOVIES_FILE = 'movies_dict.pkl'
+CHECKPOINT_FILE = 'warm_cache.checkpoint.json'
+CHUNK_SIZE = 50
+
+
+def load_movie_ids(path: str = MOVIES_FILE) -> List[int]:
+    with open(path, 'rb') as f:
+        movies_dict = pkl.load(f)
+    return [int(movies_dict['movie_id'][i]) for i in sorted(movies_dict['movie_id'].keys())]
+
+
+def load_checkpoint(path: str) -> dict:
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            logger.warning(f"Ignoring unreadable checkpoint {path}")
+    return {'position': 0, 'failed': []}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def warm(movie_ids: List[int], checkpoint_path: str = CHECKPOINT_FILE, workers: int = 4,
+         chunk_size: int = CHUNK_SIZE) -> dict:
+    checkpoint = load_checkpoint(checkpoint_path)
+    failed = set(checkpoint['failed'])
+    start = checkpoint['position']
+    if start:
+        logger.info(f"Resuming at {start}/{len(movie_ids)}")
+
+    stats = {'checked': 0, 'fresh': 0, 'fetched': 0, 'failed': 0}
+    began = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warm") as pool:
+        for chunk_start in range(start, len(movie_ids), chunk_size):
+            chunk = movie_ids[chunk_start:chunk_start + chunk_size]
+            if tmdb.breaker.retry_after():
+                # TMDB is down: wait for the breaker's probe rather than fail the whole chunk
+                logger.warning(f"TMDB circuit open, pausing {tmdb.breaker.retry_after():.0f}s")
+                time.sleep(tmdb.breaker.retry_after())
+            stale = [movie_id for movie_id in chunk if tmdb.metadata_cache.get(movie_id)[1] != HIT]
+            stats['checked'] += len(chunk)
+            stats['fresh'] += len(chunk) - len(stale)
+
+            for movie_id, data in zip(stale, pool.map(tmdb.refresh_movie_data, stale)):
+                if data is tmdb.FALLBACK_MOVIE_DATA:
+                    stats['failed'] += 1
+                    failed.add(movie_id)
+                else:
+                    stats['fetched'] += 1
+                    failed.discard(movie_id)
+
+            # Make the chunk durable before recording it as done
+            tmdb.poster_store.flush()
+            checkpoint = {'position': chunk_start + len(chunk), 'failed': sorted(failed)}
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.monotonic() - began
+            logger.info(f"{checkpoint['position']}/{len(movie_ids)} checked, {stats['fetched']} fetched, "
+                        f"{stats['failed']} failed, {stats['fetched'] / max(elapsed, 1e-9):.1f} fetches/s")
+
+    stats['elapsed'] = time.monotonic() - began
+    stats['failed_ids'] = sorted(failed)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch missing or expired TMDB metadata for the whole catalog.")
+    parser.add_argument('--movies', default=MOVIES_FILE, help="catalog pickle with a movie_id column")
+    parser.add_argument('--rate', type=float, default=tmdb.RATE_LIMIT_PER_SEC, help="TMDB requests per second")
+    parser.add_argument('--burst', type=int, default=tmdb.RATE_LIMIT_BURST, help="token bucket burst size")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent requests")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE, help="progress file used to resume")
+    parser.add_argument('--restart', action='store_true', help="start from the first movie")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    tmdb.rate_limiter = TokenBucket(args.rate, args.burst)
+
+    movie_ids = load_movie_ids(args.movies)
+    stats = warm(movie_ids, args.checkpoint, workers=args.workers)
+    logger.info(f"Done in {stats['elapsed']:.1f}s: {stats['checked']} checked, {stats['fresh']} already fresh, "
+                f"{stats['fetched']} fetched, {stats['failed']} failed")
+    if stats['failed_ids']:
+        logger.info(f"Failed movie_ids: {stats['failed_ids']}")
+
+    # A finished pass starts from the top next time (an empty catalog never wrote one)
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
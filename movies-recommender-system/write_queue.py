@@ -0,0 +1,149 @@
+import atexit
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.5  # seconds a write may wait before it is committed
+FLUSH_BATCH_SIZE = 200
+MAX_ATTEMPTS = 3  # failed writes of one row before it is dead-lettered
+DEAD_LETTERS = 100  # dropped rows kept in memory for inspection
+
+# DB-API exceptions raised by the row itself (constraint, value too large,
+# bad type), as opposed to the database being locked or unreachable. Matched
+# by class name so sqlite3, psycopg2 and mysql-connector all qualify.
+_ROW_ERRORS = ('IntegrityError', 'DataError', 'ProgrammingError')
+
+
+def is_row_error(e: BaseException) -> bool:
+    """Would writing this row fail again however often it is retried?"""
+    return isinstance(e, (ValueError, TypeError)) or any(cls.__name__ in _ROW_ERRORS for cls in type(e).__mro__)
+
+
+class WriteQueue:
+    """Deduplicating write-behind queue drained by a background thread.
+
+    put() only records the row in memory; a later put() with the same key
+    replaces the earlier one. Every FLUSH_INTERVAL (or once batch_size rows
+    are queued) the pending rows are handed to `write_batch` in one call.
+
+    When a batch fails because of its rows, they are retried one by one so
+    the good ones still land; a row that fails MAX_ATTEMPTS times is logged
+    and dead-lettered instead of blocking the queue. When the database
+    itself fails, the batch is put back (unless newer rows arrived) and
+    retried on the next flush.
+    """
+
+    def __init__(self, write_batch: Callable[[List[tuple]], None], name: str = "write-queue",
+                 flush_interval: float = FLUSH_INTERVAL, batch_size: int = FLUSH_BATCH_SIZE,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.write_batch = write_batch
+        self.name = name
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.dead_letters: Deque[tuple] = deque(maxlen=DEAD_LETTERS)
+        self._pending: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: "OrderedDict[Hashable, tuple]" = OrderedDict()  # batch being written, still readable
+        self._attempts: Dict[Hashable, int] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._writer = threading.Thread(target=self._write_behind, name=name, daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def put(self, key: Hashable, row: tuple):
+        with self._pending_lock:
+            self._pending.pop(key, None)  # re-queue at the end: newest last
+            self._pending[key] = row
+            self._attempts.pop(key, None)  # a new row gets its own attempts
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def get(self, key: Hashable) -> Optional[tuple]:
+        """The newest uncommitted row for `key`, if any."""
+        with self._pending_lock:
+            row = self._pending.get(key)
+            return row if row is not None else self._inflight.get(key)
+
+    def pending(self) -> List[tuple]:
+        """Rows not yet committed (queued or being written), oldest first."""
+        with self._pending_lock:
+            rows = OrderedDict(self._inflight)
+            for key, row in self._pending.items():
+                rows.pop(key, None)
+                rows[key] = row
+            return list(rows.values())
+
+    def flush(self):
+        with self._flush_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, OrderedDict()
+                self._inflight = OrderedDict(batch)
+            if not batch:
+                return
+            try:
+                self.write_batch(list(batch.values()))
+                failed = {}
+            except Exception as e:
+                if is_row_error(e) and len(batch) > 1:
+                    failed = self._write_one_by_one(batch)
+                else:
+                    failed = {key: (row, e) for key, row in batch.items()}
+            self._requeue(batch, failed)
+            if failed:
+                logger.error(f"{self.name}: failed to write {len(failed)} of {len(batch)} queued rows: "
+                             f"{next(iter(failed.values()))[1]}")
+
+    def _write_one_by_one(self, batch: "OrderedDict[Hashable, tuple]") -> dict:
+        failed = {}
+        for key, row in batch.items():
+            try:
+                self.write_batch([row])
+            except Exception as e:
+                failed[key] = (row, e)
+        return failed
+
+    def _requeue(self, batch: "OrderedDict[Hashable, tuple]", failed: dict):
+        """Put failed rows back ahead of newer ones, or dead-letter those out of attempts."""
+        with self._pending_lock:
+            for key in batch:
+                if key not in failed:
+                    self._attempts.pop(key, None)
+            retry = OrderedDict()
+            for key, (row, error) in failed.items():
+                if key in self._pending:
+                    continue  # a newer row for the same key replaces it
+                # Only the row's own errors count; an unreachable database isn't its fault
+                attempts = self._attempts.get(key, 0) + is_row_error(error)
+                if attempts >= self.max_attempts:
+                    self._attempts.pop(key, None)
+                    self.dead_letters.append(row)
+                    logger.error(f"{self.name}: dropping row {key!r} after {attempts} failed writes: {error}")
+                    continue
+                self._attempts[key] = attempts
+                retry[key] = row
+            retry.update(self._pending)
+            self._pending = retry
+            self._inflight = OrderedDict()
+
+    def _write_behind(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        with self._pending_lock:
+            unwritten = len(self._pending)
+        if unwritten:
+            logger.error(f"{self.name}: {unwritten} rows could not be written before shutdown")